@@ -1,8 +1,136 @@
+import asyncio
+import aiohttp
+import colorama
 import discord
 import utils
 import sqlite3
 
-def init(tree: discord.app_commands.CommandTree, bot: discord.Client, lang: dict, db: sqlite3.Connection):
+
+class AutoEmbedTemplate:
+    """
+    A compiled auto embed for one channel.
+    The description is turned into a single format string and the guild parts (thumbnail, footer) are resolved once,
+    so rendering a message is just a format call and a direct embed build.
+    """
+    def __init__(self, embed_title: str, before: str = None, after: str = None, guild: discord.Guild = None):
+        self.embed_title = embed_title
+        self.before = before
+        self.after = after
+        description = "```{0}```"
+        if before is not None:
+            description = before.replace("{", "{{").replace("}", "}}") + "\n" + description
+        if after is not None:
+            description = description + "\n" + after.replace("{", "{{").replace("}", "}}")
+        self.description = description
+        self.bound = False
+        self.guild_name = None
+        self.icon_url = None
+        if guild is not None:
+            self.bind(guild)
+
+    def bind(self, guild: discord.Guild):
+        """
+        Resolve the static part of the embed for the guild the channel lives in
+        :param guild: discord.Guild the guild of the channel
+        :return: None
+        """
+        self.guild_name = guild.name
+        self.icon_url = guild.icon.url if guild.icon else None
+        self.bound = True
+
+    def new_embed(self, description: str | None, timestamp) -> discord.Embed:
+        # Built from scratch: Embed.copy() round-trips through to_dict/from_dict and costs more than the whole render
+        embed = discord.Embed(title=self.embed_title, description=description, timestamp=timestamp)
+        if self.icon_url is not None:
+            embed.set_thumbnail(url=self.icon_url)
+        embed.set_footer(text=self.guild_name, icon_url=self.icon_url)
+        return embed
+
+    def render(self, message: discord.Message) -> discord.Embed:
+        """
+        Render the embed for a message
+        :param message: discord.Message the message to repost
+        :return: discord.Embed the embed to send
+        """
+        if not self.bound:
+            self.bind(message.guild)
+        embed = self.new_embed(self.description.format(message.content), message.created_at)
+        embed.set_author(name=message.author.name, icon_url=message.author.display_avatar.url)
+        return embed
+
+    def render_digest(self, messages: list, max_fields: int = 10) -> list:
+        """
+        Render a burst of messages as digest embeds, one field per message.
+        A message too long for a field gets its own embed from render, so nothing is cut off.
+        :param messages: list[discord.Message] the messages to merge, oldest first
+        :param max_fields: int max messages per embed
+        :return: list[discord.Embed] the embeds to send, in order
+        """
+        if not self.bound:
+            self.bind(messages[0].guild)
+        value_limit = min(1024, 5000 // max_fields) - 6  # Keep every embed under the 6000 characters limit
+        description = "\n".join(text for text in (self.before, self.after) if text is not None) or None
+        embeds = []
+        digest = None
+        for message in messages:
+            if len(message.content) > value_limit:
+                embeds.append(self.render(message))
+                digest = None  # Later messages start a new digest, to keep the order
+                continue
+            if digest is None or len(digest.fields) == max_fields:
+                digest = self.new_embed(description, message.created_at)
+                embeds.append(digest)
+            digest.add_field(name=message.author.name, value=f"```{message.content}```", inline=False)
+            digest.timestamp = message.created_at
+        return embeds
+
+
+def group_embeds(embeds: list) -> list:
+    """
+    Split embeds into groups that fit in one message: at most 10 embeds and 6000 characters in total
+    :param embeds: list[discord.Embed] the embeds, in order
+    :return: list[list[discord.Embed]] the groups, in order
+    """
+    groups = []
+    size = 0
+    for embed in embeds:
+        length = len(embed)
+        if not groups or len(groups[-1]) == 10 or size + length > 6000:
+            groups.append([])
+            size = 0
+        groups[-1].append(embed)
+        size += length
+    return groups
+
+
+class AutoEmbedQueue:
+    """
+    Collects the messages of one auto embed channel and hands them to flush in batches, in the order they arrived.
+    """
+    def __init__(self, channel: discord.TextChannel, window: float, flush):
+        self.channel = channel
+        self.window = window
+        self.flush = flush
+        self.pending = []
+        self.task = None
+
+    def push(self, message: discord.Message):
+        self.pending.append(message)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.drain())
+
+    async def drain(self):
+        while self.pending:
+            await asyncio.sleep(self.window)  # Let the burst build up
+            batch = self.pending[:100]  # Bulk delete accepts up to 100 messages
+            del self.pending[:100]
+            try:
+                await self.flush(self.channel, batch)
+            except Exception as e:
+                print(colorama.Fore.RED + "Error: " + colorama.Fore.GREEN + f"{e.__class__.__name__}: {e}" + colorama.Fore.MAGENTA + f" at line {e.__traceback__.tb_lineno}")
+
+
+def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: dict, lang: dict, db: sqlite3.Connection):
     def has_permission():
         async def predicate(interaction: discord.Interaction):
             if interaction.user.guild_permissions.administrator:
@@ -11,6 +139,22 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, lang: dict
             return False
         return discord.app_commands.check(predicate)
 
+    auto_embeds = {}  # channel_id -> AutoEmbedTemplate, loaded in on_ready and kept in sync by add/remove
+
+    queue_config = config.get("queue", {}) or {}
+    queue_enabled = queue_config.get("enabled", False)
+    queue_window = float(queue_config.get("window", 1.5))
+    digest_enabled = queue_config.get("digest", False)
+    digest_max_fields = max(1, min(int(queue_config.get("digest_max_fields", 10)), 25))
+    channel_queues = {}  # channel_id -> AutoEmbedQueue
+
+    webhook_config = config.get("webhook", {}) or {}
+    webhook_enabled = webhook_config.get("enabled", False)
+    webhook_name = webhook_config.get("name", "Auto Embeds")
+    webhooks = {}  # channel_id -> (webhook_id, webhook_token), mirrored in the autoEmbeds table
+    webhook_disabled = set()  # ids of the channels where a webhook could not be created, they use channel.send until on_ready
+    http = {"session": None}  # Shared aiohttp session for all webhook reposts, created on first use
+
     auto_commands = discord.app_commands.Group(name="embed_auto", description=lang["auto_commands_description"])
 
     @auto_commands.command(name="add", description=lang["auto_commands_description_add"])
@@ -25,8 +169,10 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, lang: dict
         """
         if channel is None:
             channel = interaction.channel
-        db.execute("INSERT OR REPLACE INTO autoEmbeds VALUES (?, ?, ?, ?)", (channel.id, embed_title, embed_description_before_message, embed_description_after_message))
+        db.execute("INSERT INTO autoEmbeds (channel_id, embed_title, embed_description_before_message, embed_description_after_message) VALUES (?, ?, ?, ?) ON CONFLICT(channel_id) DO UPDATE SET embed_title = excluded.embed_title, embed_description_before_message = excluded.embed_description_before_message, embed_description_after_message = excluded.embed_description_after_message", (channel.id, embed_title, embed_description_before_message, embed_description_after_message))
         db.commit()
+        auto_embeds[channel.id] = AutoEmbedTemplate(embed_title, embed_description_before_message, embed_description_after_message, channel.guild)
+        webhook_disabled.discard(channel.id)  # Re-adding retries the webhook, e.g. after fixing the permissions
         await interaction.response.send_message(lang["auto_embed_added"], ephemeral=True)
 
     @auto_commands.command(name="remove", description=lang["auto_commands_description_remove"])
@@ -42,38 +188,128 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, lang: dict
             channel = interaction.channel
         db.execute("DELETE FROM autoEmbeds WHERE channel_id=?", (channel.id,))
         db.commit()
+        auto_embeds.pop(channel.id, None)
+        channel_queues.pop(channel.id, None)
+        webhook = webhooks.pop(channel.id, None)
         await interaction.response.send_message(lang["auto_embed_removed"], ephemeral=True)
+        if webhook is not None:
+            try:
+                await discord.Webhook.partial(webhook[0], webhook[1], session=get_session()).delete()
+            except discord.HTTPException:
+                pass
 
     tree.add_command(auto_commands)
 
     async def on_ready():
-        db.execute("CREATE TABLE IF NOT EXISTS autoEmbeds (channel_id INTEGER PRIMARY KEY NOT NULL, embed_title TEXT NOT NULL, embed_description_before_message TEXT DEFAULT NULL, embed_description_after_message TEXT DEFAULT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS autoEmbeds (channel_id INTEGER PRIMARY KEY NOT NULL, embed_title TEXT NOT NULL, embed_description_before_message TEXT DEFAULT NULL, embed_description_after_message TEXT DEFAULT NULL, webhook_id INTEGER DEFAULT NULL, webhook_token TEXT DEFAULT NULL)")
+        columns = [column[1] for column in db.execute("PRAGMA table_info(autoEmbeds)").fetchall()]
+        if "webhook_id" not in columns:  # Tables created before the webhook mode
+            db.execute("ALTER TABLE autoEmbeds ADD COLUMN webhook_id INTEGER DEFAULT NULL")
+            db.execute("ALTER TABLE autoEmbeds ADD COLUMN webhook_token TEXT DEFAULT NULL")
         db.commit()
+        auto_embeds.clear()
+        webhooks.clear()
+        webhook_disabled.clear()
+        for channel_id, embed_title, before, after, webhook_id, webhook_token in db.execute("SELECT channel_id, embed_title, embed_description_before_message, embed_description_after_message, webhook_id, webhook_token FROM autoEmbeds").fetchall():
+            channel = bot.get_channel(channel_id)
+            auto_embeds[channel_id] = AutoEmbedTemplate(embed_title, before, after, channel.guild if channel is not None else None)
+            if webhook_id is not None:
+                webhooks[channel_id] = (webhook_id, webhook_token)
+
+    def get_session() -> aiohttp.ClientSession:
+        if http["session"] is None or http["session"].closed:
+            http["session"] = aiohttp.ClientSession()
+        return http["session"]
+
+    async def get_webhook(channel: discord.TextChannel) -> discord.Webhook | None:
+        """
+        Get the repost webhook of a channel, creating and storing it the first time
+        :param channel: discord.TextChannel the auto embed channel
+        :return: discord.Webhook or None if no webhook can be created there (missing permission, webhook limit reached)
+        """
+        if channel.id in webhook_disabled:
+            return None
+        webhook = webhooks.get(channel.id)
+        if webhook is None:
+            try:
+                created = await channel.create_webhook(name=webhook_name)
+            except discord.HTTPException as e:  # Remembered, so every repost doesn't retry a failing create_webhook
+                webhook_disabled.add(channel.id)
+                print(colorama.Fore.YELLOW + f"[!] AutoEmbeds: could not create a webhook in #{channel.name}, reposting as the bot: {e}")
+                return None
+            webhook = webhooks[channel.id] = (created.id, created.token)
+            db.execute("UPDATE autoEmbeds SET webhook_id = ?, webhook_token = ? WHERE channel_id = ?", (created.id, created.token, channel.id))
+            db.commit()
+        return discord.Webhook.partial(webhook[0], webhook[1], session=get_session())
+
+    async def repost(channel: discord.TextChannel, embeds: list):
+        """
+        Send rendered auto embeds in one message, through the channel webhook when webhook mode is enabled
+        :param channel: discord.TextChannel the auto embed channel
+        :param embeds: list[discord.Embed] the embeds to send, at most 10 and 6000 characters in total
+        :return: None
+        """
+        if webhook_enabled:
+            for _ in range(2):  # Second try recreates a webhook that was deleted from the channel settings
+                webhook = await get_webhook(channel)
+                if webhook is None:
+                    break
+                try:
+                    return await webhook.send(embeds=embeds)
+                except discord.NotFound:
+                    webhooks.pop(channel.id, None)
+                    db.execute("UPDATE autoEmbeds SET webhook_id = NULL, webhook_token = NULL WHERE channel_id = ?", (channel.id,))
+                    db.commit()
+                except discord.HTTPException as e:  # The original message is already deleted, never lose the repost
+                    print(colorama.Fore.YELLOW + f"[!] AutoEmbeds: webhook repost failed in #{channel.name}, reposting as the bot: {e}")
+                    break
+        await channel.send(embeds=embeds)
 
     async def on_message(message: discord.Message):
+        template = auto_embeds.get(message.channel.id)  # Most channels are not configured, so reject them first
+        if template is None:
+            return
         if message.author.bot:
             return
         if message.channel.type != discord.ChannelType.text:
             return
-        auto_embed = db.execute("SELECT * FROM autoEmbeds WHERE channel_id=?", (message.channel.id,)).fetchone()
-        if auto_embed is None:
+        if queue_enabled:
+            queue = channel_queues.get(message.channel.id)
+            if queue is None:
+                queue = channel_queues[message.channel.id] = AutoEmbedQueue(message.channel, queue_window, flush_messages)
+            queue.push(message)
             return
-        message_content = message.content
-        embed = discord.Embed(title=auto_embed[1], timestamp=message.created_at)
-        if auto_embed[2] is not None: # Before
-            embed.description = auto_embed[2] + "\n" + f"```{message_content}```"
-        embed.description = message.content
-        if auto_embed[3] is not None: # After
-            embed.description = f"```{message_content}```" + "\n" + auto_embed[3]
-        if auto_embed[2] is not None and auto_embed[3] is not None:
-            embed.description = auto_embed[2] + "\n" + f"```{message_content}```" + "\n" + auto_embed[3]
-        if auto_embed[2] is None and auto_embed[3] is None:
-            embed.description = f"```{message_content}```"
-        embed.set_author(name=message.author.name, icon_url=message.author.avatar.url)
-        embed.set_thumbnail(url=message.guild.icon.url)
-        embed.set_footer(text=message.guild.name, icon_url=message.guild.icon.url)
+        embed = template.render(message)
         await message.delete()
-        await message.channel.send(embed=embed)
+        await repost(message.channel, [embed])
+
+    async def flush_messages(channel: discord.TextChannel, messages: list):
+        """
+        Repost a batch of queued messages: one bulk delete, then the embeds in arrival order
+        :param channel: discord.TextChannel the auto embed channel
+        :param messages: list[discord.Message] the queued messages, oldest first
+        :return: None
+        """
+        template = auto_embeds.get(channel.id)
+        if template is None:  # Auto embed was removed while the messages were queued
+            return
+        if digest_enabled:
+            embeds = template.render_digest(messages, digest_max_fields)
+        else:
+            embeds = [template.render(message) for message in messages]
+        if len(messages) == 1:
+            await messages[0].delete()
+        else:
+            try:
+                await channel.delete_messages(messages)
+            except discord.HTTPException:  # Fallback if one of the messages was already deleted
+                for message in messages:
+                    try:
+                        await message.delete()
+                    except discord.NotFound:
+                        pass
+        for group in group_embeds(embeds):  # Up to 10 embeds per message, so a burst costs a few sends instead of one per message
+            await repost(channel, group)
 
     if not hasattr(bot, "on_message_callbacks"):
         bot.on_message_callbacks = []
@@ -1,19 +1,148 @@
+import asyncio
 import base64
 import binascii
 import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
 from typing import Literal
+import aiohttp
 import discord
 import utils
-import requests
 import colorama
 
+SHARE_LINK_CACHE_SIZE = 128
+ACCESS_CACHE_TTL = 60  # seconds a member's permission check result is reused
+PENDING_ACTION_TTL = 120  # seconds a user has to pick the target message with the context menu
+MESSAGE_LINK_REGEX = re.compile(r"https://(?:ptb\.|canary\.)?discord(?:app)?\.com/channels/\d+/(\d+)/(\d+)")
+CHANNEL_REGEX = re.compile(r"<#(\d+)>|(\d+)")
+share_link_cache = OrderedDict()  # share link -> (content, embeds), least recently used first
+http = {"session": None}  # Shared aiohttp session, created on first use inside the event loop
+
+
+def get_session() -> aiohttp.ClientSession:
+    if http["session"] is None or http["session"].closed:
+        http["session"] = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+    return http["session"]
+
+
+async def resolve_share_link(url: str) -> tuple[str | None, list[discord.Embed]]:
+    """
+    Resolve a discohook share link into the message content and embeds it holds.
+    Results are kept in a small LRU cache, so applying the same link again costs no request and no decoding.
+    :param url: str the https://share.discohook.app/go/... link
+    :return: tuple of the message content and a fresh list of discord.Embed
+    :raises aiohttp.ClientError, TimeoutError: when discohook could not be reached
+    """
+    cached = share_link_cache.get(url)
+    if cached is None:
+        async with get_session().get(url) as response:
+            base64_json = str(response.url).replace("https://discohook.org/?data=", "")
+        try:
+            embed_json = json.loads(base64.b64decode(base64_json).decode("utf-8"))["messages"][0]["data"]
+        except binascii.Error:
+            embed_json = json.loads(base64.urlsafe_b64decode(base64_json + '=' * (-len(base64_json) % 4)).decode("utf-8"))["messages"][0]["data"]  # fix padding sometimes it is missing
+        embeds = []
+        for em in embed_json["embeds"]:
+            if em['color'] is None:
+                em['color'] = discord.Color.from_str("#2b2d31").value
+            embeds.append(discord.Embed.from_dict(em))
+        cached = (embed_json["content"], embeds)
+        share_link_cache[url] = cached
+        if len(share_link_cache) > SHARE_LINK_CACHE_SIZE:
+            share_link_cache.popitem(last=False)
+    else:
+        share_link_cache.move_to_end(url)
+    return cached[0], [embed.copy() for embed in cached[1]]
+
+
+async def apply_share_link(bot: discord.Client, member: discord.Member, url: str, targets: list[str], errors: dict, concurrency: int = 4) -> tuple[list[tuple[str, str | None]], float]:
+    """
+    Apply one discohook share link to many messages.
+    The payload is decoded once. Targets in the same channel are edited one after the other (they share a rate limit bucket),
+    while up to `concurrency` channels are worked on at the same time.
+    :param bot: discord.Client the bot
+    :param member: discord.Member the member applying the link, only channels they can send messages in are edited
+    :param url: str the https://share.discohook.app/go/... link
+    :param targets: list[str] message links, channel mentions or channel ids. For a channel, the latest message of the bot is edited
+    :param errors: dict the localized error texts: invalid_target, channel_not_found, no_access, no_bot_message
+    :param concurrency: int how many channels are edited at the same time
+    :return: tuple of the per-target results (target, error or None) in input order, and the total wall time in seconds
+    :raises aiohttp.ClientError, TimeoutError: when discohook could not be reached
+    """
+    start = time.perf_counter()
+    content, embeds = await resolve_share_link(url)
+    results = {}
+    by_channel = {}  # channel_id -> [(target, message_id or None)]
+    for target in targets:
+        match = MESSAGE_LINK_REGEX.fullmatch(target)
+        if match:
+            by_channel.setdefault(int(match.group(1)), []).append((target, int(match.group(2))))
+            continue
+        match = CHANNEL_REGEX.fullmatch(target)
+        if match:
+            by_channel.setdefault(int(match.group(1) or match.group(2)), []).append((target, None))
+            continue
+        results[target] = errors["invalid_target"]
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def edit_channel(channel_id: int, channel_targets: list):
+        async with semaphore:
+            channel = member.guild.get_channel(channel_id)
+            for target, message_id in channel_targets:
+                if channel is None or not isinstance(channel, discord.TextChannel):
+                    results[target] = errors["channel_not_found"]
+                    continue
+                permissions = channel.permissions_for(member)  # Like replying with *edit embed, the member must be able to post there
+                if not permissions.view_channel or not (permissions.send_messages or permissions.manage_messages):
+                    results[target] = errors["no_access"]
+                    continue
+                try:
+                    if message_id is None:
+                        message = None
+                        async for history_message in channel.history(limit=50):
+                            if history_message.author.id == bot.user.id:
+                                message = history_message
+                                break
+                        if message is None:
+                            results[target] = errors["no_bot_message"]
+                            continue
+                    else:
+                        message = channel.get_partial_message(message_id)  # No fetch needed to edit
+                    await message.edit(embeds=[embed.copy() for embed in embeds], content=content)
+                    results[target] = None
+                except discord.HTTPException as e:
+                    results[target] = f"{e.__class__.__name__}: {e.text or e.status}"
+
+    await asyncio.gather(*(edit_channel(channel_id, channel_targets) for channel_id, channel_targets in by_channel.items()))
+    return [(target, results.get(target)) for target in targets], time.perf_counter() - start
+
+
+def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: dict, lang: dict, db: sqlite3.Connection):
+    access_roles = frozenset(int(role) for role in config["access role"])
+    access_cache = {}  # (guild_id, member_id) -> (allowed, expires_at), expires after ACCESS_CACHE_TTL or on on_member_update
+
+    def has_access(member: discord.Member) -> bool:
+        """
+        Check if a member has one of the access roles
+        :param member: discord.Member the member to check
+        :return: bool True if the member may use the embed manager
+        """
+        key = (member.guild.id, member.id)
+        now = time.monotonic()
+        cached = access_cache.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        allowed = not access_roles.isdisjoint(role.id for role in member.roles)
+        access_cache[key] = (allowed, now + ACCESS_CACHE_TTL)
+        return allowed
 
-def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: dict, lang: dict):
     def has_permission():
         async def predicate(interaction: discord.Interaction):
-            for role in config["access role"]:
-                if role in [role.id for role in interaction.user.roles]:
-                    return True
+            if has_access(interaction.user):
+                return True
             await interaction.response.send_message(lang["no_permission_ephemeral"], ephemeral=True)
             return False
 
@@ -46,15 +175,179 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
 
     button_commands = discord.app_commands.Group(name="button", description=lang["button_commands_description"])
 
+    role_buttons = {}  # message_id -> list of button rows (dicts) in display order, mirrored in embedManagerButtons
+    role_selects = {}  # message_id -> list of select option rows (dicts) in display order, mirrored in embedManagerSelectOptions
+
+    class RolePanelView(discord.ui.View):
+        """
+        Persistent view of the role buttons and the role select menu of one message, built from the registry
+        """
+        def __init__(self, message_id: int, buttons: list, options: list):
+            super().__init__(timeout=None)
+            for button in buttons:
+                item = discord.ui.Button(style=discord.ButtonStyle(button["style"]), label=button["label"], custom_id=button["custom_id"], emoji=button["emoji"])
+                item.callback = self.create_callback(button["custom_id"])
+                self.add_item(item)
+            if options:
+                select = discord.ui.Select(custom_id=f"select_role_panel_{message_id}", placeholder=lang["select_placeholder"], min_values=0, max_values=len(options),
+                                           options=[discord.SelectOption(label=option["label"], value=str(option["role_id"]), emoji=option["emoji"], description=option["description"]) for option in options])
+                select.callback = self.create_select_callback(select, options)
+                self.add_item(select)
+
+        def create_callback(self, custom_id: str):
+            async def callback(interaction: discord.Interaction):
+                await handle_role_button(interaction, custom_id)
+            return callback
+
+        def create_select_callback(self, select: discord.ui.Select, options: list):
+            async def callback(interaction: discord.Interaction):
+                await apply_role_selection(interaction, options, select.values, replace=False)
+            return callback
+
+    class MemberRoleSelectView(discord.ui.View):
+        """
+        Ephemeral copy of a panel select for one member, pre-filled with the panel roles they have, so unpicking removes
+        """
+        def __init__(self, options: list, member_role_ids: set):
+            super().__init__(timeout=300)
+            select = discord.ui.Select(placeholder=lang["select_manage_placeholder"], min_values=0, max_values=len(options),
+                                       options=[discord.SelectOption(label=option["label"], value=str(option["role_id"]), emoji=option["emoji"], description=option["description"], default=option["role_id"] in member_role_ids) for option in options])
+
+            async def callback(interaction: discord.Interaction):
+                await apply_role_selection(interaction, options, select.values, replace=True)
+            select.callback = callback
+            self.add_item(select)
+
+    def register_panel(message_id: int) -> RolePanelView | None:
+        """
+        Build the persistent view of a message from the registry and register it
+        :param message_id: int the id of the message carrying the panel
+        :return: RolePanelView | None the view to put on the message, None if the message has no buttons or select left
+        """
+        buttons = role_buttons.get(message_id, [])
+        options = role_selects.get(message_id, [])
+        if not buttons and not options:
+            return None
+        view = RolePanelView(message_id, buttons, options)
+        bot.add_view(view, message_id=message_id)
+        return view
+
+    def save_buttons(message: discord.Message, buttons: list):
+        """
+        Store the buttons of a message in the registry and register its persistent view
+        :param message: discord.Message the message carrying the buttons
+        :param buttons: list the button rows, in display order
+        :return: RolePanelView | None the view to put on the message, None if the message has no buttons or select left
+        """
+        db.execute("DELETE FROM embedManagerButtons WHERE message_id = ?", (message.id,))
+        db.executemany("INSERT INTO embedManagerButtons (message_id, channel_id, custom_id, role_id, style, label, emoji, toggleable, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       [(message.id, message.channel.id, button["custom_id"], button["role_id"], button["style"], button["label"], button["emoji"], button["toggleable"], position) for position, button in enumerate(buttons)])
+        db.commit()
+        if buttons:
+            role_buttons[message.id] = buttons
+        else:
+            role_buttons.pop(message.id, None)
+        return register_panel(message.id)
+
+    def save_select_options(message: discord.Message, options: list):
+        """
+        Store the role select options of a message in the registry and register its persistent view
+        :param message: discord.Message the message carrying the select menu
+        :param options: list the option rows, in display order
+        :return: RolePanelView | None the view to put on the message, None if the message has no buttons or select left
+        """
+        db.execute("DELETE FROM embedManagerSelectOptions WHERE message_id = ?", (message.id,))
+        db.executemany("INSERT INTO embedManagerSelectOptions (message_id, channel_id, role_id, label, emoji, description, position) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       [(message.id, message.channel.id, option["role_id"], option["label"], option["emoji"], option["description"], position) for position, option in enumerate(options)])
+        db.commit()
+        if options:
+            role_selects[message.id] = options
+        else:
+            role_selects.pop(message.id, None)
+        return register_panel(message.id)
+
+    def max_buttons(message: discord.Message) -> int:
+        return 20 if role_selects.get(message.id) else 25  # The select menu takes one of the 5 rows
+
+    def get_buttons(message: discord.Message) -> list:
+        """
+        Get the role buttons of a message from the registry.
+        Messages set up before the registry existed are read from their components once.
+        :param message: discord.Message the message
+        :return: list the button rows, in display order
+        """
+        if message.id in role_buttons:
+            return list(role_buttons[message.id])
+        buttons = []
+        for ar in message.components:
+            if isinstance(ar, discord.components.ActionRow):
+                for btn in ar.children:
+                    if isinstance(btn, discord.components.Button) and btn.custom_id:
+                        prefix, _, role_id = btn.custom_id.rpartition("_")
+                        if prefix in role_button_handlers and role_id.isdigit():
+                            buttons.append({"custom_id": btn.custom_id, "role_id": int(role_id), "style": btn.style.value, "label": btn.label, "emoji": str(btn.emoji) if btn.emoji else None, "toggleable": prefix == "toggle_button_role"})
+        return buttons
+
+    pending_actions = {}  # user_id -> (action, kwargs, expires_at), applied by the role panel message context menu
+
+    def set_pending_action(user: discord.abc.User, action, **kwargs):
+        """
+        Remember what a user wants to do until they pick the target message with the context menu
+        :param user: discord.abc.User the user who ran the command
+        :param action: coroutine function called with (interaction, message, **kwargs)
+        :return: None
+        """
+        now = time.monotonic()
+        for user_id in [user_id for user_id, pending in pending_actions.items() if pending[2] <= now]:
+            del pending_actions[user_id]
+        pending_actions[user.id] = (action, kwargs, now + PENDING_ACTION_TTL)
+
+    async def add_button(interaction: discord.Interaction, msg: discord.Message, style: int, role: discord.Role, text: str, emoji: str | None, toggleable: bool):
+        custom_id = f"toggle_button_role_{role.id}" if toggleable else f"button_role_{role.id}"
+        buttons = get_buttons(msg)
+        if any(button["role_id"] == role.id for button in buttons):
+            return await interaction.followup.send(lang["button_existing"], ephemeral=True)
+        if len(buttons) >= max_buttons(msg):
+            return await interaction.followup.send(lang["too_many_buttons"].replace("{{max}}", str(max_buttons(msg))), ephemeral=True)
+        buttons.insert(0, {"custom_id": custom_id, "role_id": role.id, "style": style, "label": text or None, "emoji": emoji, "toggleable": toggleable})
+        await msg.edit(view=save_buttons(msg, buttons))
+        await interaction.followup.send(lang["action_done"], ephemeral=True)
+
+    async def remove_button(interaction: discord.Interaction, msg: discord.Message, role: discord.Role):
+        buttons = get_buttons(msg)
+        remaining = [button for button in buttons if button["role_id"] != role.id]
+        if len(remaining) == len(buttons):
+            return await interaction.followup.send(lang["button_not_found"], ephemeral=True)
+        await msg.edit(view=save_buttons(msg, remaining))
+        await interaction.followup.send(lang["action_done"], ephemeral=True)
+
+    async def add_select_option(interaction: discord.Interaction, msg: discord.Message, role: discord.Role, label: str | None, emoji: str | None, description: str | None):
+        options = list(role_selects.get(msg.id, []))
+        if any(option["role_id"] == role.id for option in options):
+            return await interaction.followup.send(lang["select_option_existing"], ephemeral=True)
+        if len(options) >= 25:
+            return await interaction.followup.send(lang["too_many_select_options"], ephemeral=True)
+        buttons = get_buttons(msg)
+        if not options and len(buttons) > 20:
+            return await interaction.followup.send(lang["too_many_buttons_for_select"], ephemeral=True)
+        if buttons and msg.id not in role_buttons:  # Keep buttons set up before the registry existed
+            save_buttons(msg, buttons)
+        options.append({"role_id": role.id, "label": label or role.name, "emoji": emoji, "description": description})
+        await msg.edit(view=save_select_options(msg, options))
+        await interaction.followup.send(lang["action_done"], ephemeral=True)
+
+    async def remove_select_option(interaction: discord.Interaction, msg: discord.Message, role: discord.Role):
+        options = role_selects.get(msg.id, [])
+        remaining = [option for option in options if option["role_id"] != role.id]
+        if len(remaining) == len(options):
+            return await interaction.followup.send(lang["select_option_not_found"], ephemeral=True)
+        await msg.edit(view=save_select_options(msg, remaining))
+        await interaction.followup.send(lang["action_done"], ephemeral=True)
+
     @button_commands.command(name="add", description=lang["add_command_description"])
     @has_permission()
     async def button_add(interaction: discord.Interaction, color: Literal["red", "green", "blue", "grey"], role: discord.Role, text: str = "", emoji: str = None, toggleable: bool = False):
         await interaction.response.send_message(lang["select_message"], ephemeral=True)
-        msg = await bot.wait_for("message", check=lambda m: m.author.id == interaction.user.id and m.content == "*select", timeout=60)
-        await msg.delete()
-        if not msg.reference:
-            return await interaction.followup.send(lang["select_no_reference"], ephemeral=True)
-        msg = msg.reference.resolved
         colors = {
             "red": discord.ButtonStyle.red,
             "green": discord.ButtonStyle.green,
@@ -63,17 +356,76 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
         }
         if emoji is not None and emoji.startswith("<") and emoji.endswith(">"):
             emoji = await utils.EmojiConverter().convert(interaction, emoji, bot)
-        if toggleable:
-            buttons = [discord.ui.Button(style=colors[color], label=text, custom_id=f"toggle_button_role_{role.id}", emoji=emoji)]
-        else:
-            buttons = [discord.ui.Button(style=colors[color], label=text, custom_id=f"button_role_{role.id}", emoji=emoji)]
-        for ar in msg.components:
-            if isinstance(ar, discord.components.ActionRow):
-                for btn in ar.children:
-                    if isinstance(btn, discord.components.Button):
-                        buttons.append(discord.ui.Button(style=btn.style, label=btn.label, custom_id=btn.custom_id, emoji=btn.emoji))
-        view = utils.CustomButtons(buttons)
-        await msg.edit(view=view)
+        set_pending_action(interaction.user, add_button, style=colors[color].value, role=role, text=text, emoji=str(emoji) if emoji else None, toggleable=toggleable)
+
+    @button_commands.command(name="remove", description=lang["remove_command_description"])
+    @has_permission()
+    async def button_remove(interaction: discord.Interaction, role: discord.Role):
+        await interaction.response.send_message(lang["select_message"], ephemeral=True)
+        set_pending_action(interaction.user, remove_button, role=role)
+
+    select_commands = discord.app_commands.Group(name="select", description=lang["select_commands_description"])
+
+    @select_commands.command(name="add", description=lang["select_add_command_description"])
+    @has_permission()
+    async def select_add(interaction: discord.Interaction, role: discord.Role, label: str = None, emoji: str = None, description: str = None):
+        await interaction.response.send_message(lang["select_message"], ephemeral=True)
+        if emoji is not None and emoji.startswith("<") and emoji.endswith(">"):
+            emoji = await utils.EmojiConverter().convert(interaction, emoji, bot)
+        set_pending_action(interaction.user, add_select_option, role=role, label=label, emoji=str(emoji) if emoji else None, description=description)
+
+    @select_commands.command(name="remove", description=lang["select_remove_command_description"])
+    @has_permission()
+    async def select_remove(interaction: discord.Interaction, role: discord.Role):
+        await interaction.response.send_message(lang["select_message"], ephemeral=True)
+        set_pending_action(interaction.user, remove_select_option, role=role)
+
+    embed_manager_commands.add_command(select_commands)
+
+    @has_permission()
+    async def role_panel_context_menu(interaction: discord.Interaction, message: discord.Message):
+        """
+        Apply the pending button/select action of the user to the message it was used on
+        :param interaction: discord.Interaction the interaction
+        :param message: discord.Message the message picked from the context menu
+        :return: None
+        """
+        pending = pending_actions.pop(interaction.user.id, None)
+        if pending is None or pending[2] <= time.monotonic():
+            return await interaction.response.send_message(lang["no_pending_action"], ephemeral=True)
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await pending[0](interaction, message, **pending[1])
+
+    role_panel_menu = discord.app_commands.ContextMenu(name=lang["context_menu_name"], callback=role_panel_context_menu)
+    role_panel_menu.error(embed_manager_commands_error)
+    tree.add_command(role_panel_menu)
+
+    @embed_manager_commands.command(name="apply", description=lang["apply_command_description"])
+    @discord.app_commands.describe(link=lang["apply_link_description"], targets=lang["apply_targets_description"])
+    @has_permission()
+    async def embed_apply(interaction: discord.Interaction, link: str, targets: str):
+        """
+        Apply a discohook share link to many messages at once
+        :param interaction: discord.Interaction the interaction
+        :param link: str the discohook share link
+        :param targets: str message links, channel mentions or channel ids separated by spaces or commas
+        :return: None
+        """
+        if not link.startswith("https://share.discohook.app/go"):
+            return await interaction.response.send_message(lang["edit_embed_invalid_url"], ephemeral=True)
+        target_list = list(dict.fromkeys(target for target in re.split(r"[\s,]+", targets) if target))
+        if not target_list:
+            return await interaction.response.send_message(lang["apply_no_targets"], ephemeral=True)
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            results, elapsed = await apply_share_link(bot, interaction.user, link, target_list, {"invalid_target": lang["apply_invalid_target"], "channel_not_found": lang["apply_channel_not_found"], "no_access": lang["apply_no_access"], "no_bot_message": lang["apply_no_bot_message"]}, int(config.get("bulk concurrency", 4)))
+        except (aiohttp.ClientError, TimeoutError):
+            return await interaction.followup.send(lang["edit_embed_fetch_failed"], ephemeral=True)
+        lines = [f"✅ {target}" if error is None else f"❌ {target}: {error}" for target, error in results]
+        succeeded = sum(1 for _, error in results if error is None)
+        embed = discord.Embed(title=lang["apply_report_title"], description="\n".join(lines)[:4096], color=discord.Color.green() if succeeded == len(results) else discord.Color.orange())
+        embed.set_footer(text=lang["apply_report_footer"].replace("{{succeeded}}", str(succeeded)).replace("{{total}}", str(len(results))).replace("{{seconds}}", f"{elapsed:.2f}"))
+        await interaction.followup.send(embed=embed, ephemeral=True)
 
     embed_manager_commands.add_command(button_commands)
     tree.add_command(embed_manager_commands)
@@ -83,9 +435,8 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
             return
         if message.content.startswith("*edit embed"):
             await message.delete()
-            for role in config["access role"]:
-                if not role in [role.id for role in message.author.roles]:
-                    return await message.channel.send(lang["no_permission_message"], delete_after=5)
+            if not has_access(message.author):
+                return await message.channel.send(lang["no_permission_message"], delete_after=5)
             args = message.content.split(" ")[2:]
             if len(args) > 1:
                 return await message.channel.send(lang["edit_embed_too_many_args"])
@@ -94,52 +445,139 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
             if not args[0].startswith("https://share.discohook.app/go"):
                 return await message.channel.send(lang["edit_embed_invalid_url"])
             msg = message.reference.resolved
-            response = requests.get(args[0])
-            base64_json = response.url.replace("https://discohook.org/?data=", "")
             try:
-                embed_json = json.loads(base64.b64decode(base64_json).decode("utf-8"))["messages"][0]["data"]
-            except binascii.Error:
-                embed_json = json.loads(base64.urlsafe_b64decode(base64_json + '=' * (-len(base64_json) % 4)).decode("utf-8"))["messages"][0]["data"]  # fix padding sometimes it is missing
-            embeds = []
-            for em in embed_json["embeds"]:
-                if em['color'] is None:
-                    em['color'] = discord.Color.from_str("#2b2d31").value
-                embeds.append(discord.Embed.from_dict(em))
-            await msg.edit(embeds=embeds, content=embed_json["content"])
-    if not hasattr(bot, "on_ready_callbacks"):
+                content, embeds = await resolve_share_link(args[0])
+            except (aiohttp.ClientError, TimeoutError):
+                return await message.channel.send(lang["edit_embed_fetch_failed"])
+            await msg.edit(embeds=embeds, content=content)
+    if not hasattr(bot, "on_message_callbacks"):
         bot.on_message_callbacks = []
     bot.on_message_callbacks.append(on_message)
 
+    async def on_ready():
+        db.execute("CREATE TABLE IF NOT EXISTS embedManagerButtons (message_id INTEGER NOT NULL, channel_id INTEGER NOT NULL, custom_id TEXT NOT NULL, role_id INTEGER NOT NULL, style INTEGER NOT NULL, label TEXT DEFAULT NULL, emoji TEXT DEFAULT NULL, toggleable BOOLEAN DEFAULT false, position INTEGER NOT NULL, PRIMARY KEY (message_id, custom_id))")
+        db.commit()
+        role_buttons.clear()
+        for message_id, custom_id, role_id, style, label, emoji, toggleable in db.execute("SELECT message_id, custom_id, role_id, style, label, emoji, toggleable FROM embedManagerButtons ORDER BY message_id, position").fetchall():
+            role_buttons.setdefault(message_id, []).append({"custom_id": custom_id, "role_id": role_id, "style": style, "label": label, "emoji": emoji, "toggleable": bool(toggleable)})
+        db.execute("CREATE TABLE IF NOT EXISTS embedManagerSelectOptions (message_id INTEGER NOT NULL, channel_id INTEGER NOT NULL, role_id INTEGER NOT NULL, label TEXT NOT NULL, emoji TEXT DEFAULT NULL, description TEXT DEFAULT NULL, position INTEGER NOT NULL, PRIMARY KEY (message_id, role_id))")
+        db.commit()
+        role_selects.clear()
+        for message_id, role_id, label, emoji, description in db.execute("SELECT message_id, role_id, label, emoji, description FROM embedManagerSelectOptions ORDER BY message_id, position").fetchall():
+            role_selects.setdefault(message_id, []).append({"role_id": role_id, "label": label, "emoji": emoji, "description": description})
+        for message_id in role_buttons.keys() | role_selects.keys():
+            register_panel(message_id)  # Buttons and selects keep working after a restart
+
+    if not hasattr(bot, "on_ready_callbacks"):
+        bot.on_ready_callbacks = []
+    bot.on_ready_callbacks.append(on_ready)
+
+    async def add_role(interaction: discord.Interaction, role: discord.Role):
+        """
+        Give the role of a button to the member who clicked it
+        :param interaction: discord.Interaction the button interaction
+        :param role: discord.Role the role linked to the button
+        :return: None
+        """
+        if role in interaction.user.roles:
+            return await interaction.response.send_message(lang["role_already_added"].replace("{{role}}", role.mention), ephemeral=True)
+        try:
+            await interaction.user.add_roles(role)
+        except Exception as e:
+            if isinstance(e, discord.Forbidden):
+                return await interaction.response.send_message(lang["missing_permission"], ephemeral=True)
+            else:
+                print(colorama.Fore.RED + "Error: " + colorama.Fore.GREEN + f"{e.__class__.__name__}: {e}" + colorama.Fore.MAGENTA + f" at line {e.__traceback__.tb_lineno}")
+                return await interaction.response.send_message(lang["error_occurred"], ephemeral=True)
+        await interaction.response.send_message(lang["role_added"].replace("{{role}}", role.mention), ephemeral=True)
+
+    async def toggle_role(interaction: discord.Interaction, role: discord.Role):
+        """
+        Give or remove the role of a toggleable button
+        :param interaction: discord.Interaction the button interaction
+        :param role: discord.Role the role linked to the button
+        :return: None
+        """
+        if role in interaction.user.roles:
+            await interaction.user.remove_roles(role)
+            return await interaction.response.send_message(lang["role_removed"].replace("{{role}}", role.mention), ephemeral=True)
+        try:
+            await interaction.user.add_roles(role)
+        except Exception as e:
+            if isinstance(e, discord.Forbidden):
+                return await interaction.response.send_message(lang["missing_permission"], ephemeral=True)
+            else:
+                print(colorama.Fore.RED + "Error: " + colorama.Fore.GREEN + f"{e.__class__.__name__}: {e}" + colorama.Fore.MAGENTA + f" at line {e.__traceback__.tb_lineno}")
+                return await interaction.response.send_message(lang["error_occurred"], ephemeral=True)
+        await interaction.response.send_message(lang["role_added"].replace("{{role}}", role.mention), ephemeral=True)
+
+    async def apply_role_selection(interaction: discord.Interaction, options: list, values: list, replace: bool):
+        """
+        Apply the roles picked in a role select menu with a single member edit.
+        The shared select on the panel can't show what each member has, so it only adds; the member then gets their own
+        select pre-filled with their panel roles, where the picks replace those roles.
+        :param interaction: discord.Interaction the select interaction
+        :param options: list the option rows of the select menu
+        :param values: list[str] the role ids the member picked
+        :param replace: bool True for the member's own select (unpicked panel roles are removed), False for the shared one
+        :return: None
+        """
+        member = interaction.user
+        panel_roles = {option["role_id"] for option in options}
+        selected = {int(value) for value in values if interaction.guild.get_role(int(value)) is not None} & panel_roles
+        current = {role.id for role in member.roles if not role.is_default()}
+        wanted = ((current - panel_roles) if replace else current) | selected
+        added, removed = wanted - current, current - wanted
+        if added or removed:
+            try:
+                await member.edit(roles=[discord.Object(id=role_id) for role_id in wanted])
+            except Exception as e:
+                if isinstance(e, discord.Forbidden):
+                    return await interaction.response.send_message(lang["missing_permission"], ephemeral=True)
+                else:
+                    print(colorama.Fore.RED + "Error: " + colorama.Fore.GREEN + f"{e.__class__.__name__}: {e}" + colorama.Fore.MAGENTA + f" at line {e.__traceback__.tb_lineno}")
+                    return await interaction.response.send_message(lang["error_occurred"], ephemeral=True)
+            content = lang["roles_updated"].replace("{{added}}", " ".join(f"<@&{role_id}>" for role_id in added) or "-").replace("{{removed}}", " ".join(f"<@&{role_id}>" for role_id in removed) or "-")
+        else:
+            content = lang["roles_unchanged"]
+        view = MemberRoleSelectView(options, wanted & panel_roles)
+        if replace:
+            await interaction.response.edit_message(content=content, view=view)
+        else:
+            await interaction.response.send_message(content, view=view, ephemeral=True)
+
+    role_button_handlers = {  # custom_id prefix (without the trailing "_<role id>") -> handler
+        "button_role": add_role,
+        "toggle_button_role": toggle_role,
+    }
+
+    async def handle_role_button(interaction: discord.Interaction, custom_id: str):
+        prefix, _, role_id = custom_id.rpartition("_")
+        handler = role_button_handlers.get(prefix)
+        if handler is None or not role_id.isdigit():
+            return
+        role = interaction.guild.get_role(int(role_id))
+        if role is None:
+            return await interaction.response.send_message(lang["role_not_found"], ephemeral=True)
+        await handler(interaction, role)
+
     async def on_interaction(interaction: discord.Interaction):
-        if interaction.type == discord.InteractionType.component:
-            if interaction.data["component_type"] == 2:
-                if "custom_id" in interaction.data and interaction.data["custom_id"].startswith("button_role_"):
-                    role = discord.utils.get(interaction.guild.roles, id=int(interaction.data["custom_id"].replace("button_role_", "")))
-                    if role in interaction.user.roles:
-                        return await interaction.response.send_message(lang["role_already_added"].replace("{{role}}", role.mention), ephemeral=True)
-                    try:
-                        await interaction.user.add_roles(role)
-                    except Exception as e:
-                        if isinstance(e, discord.Forbidden):
-                            return await interaction.response.send_message(lang["missing_permission"], ephemeral=True)
-                        else:
-                            print(colorama.Fore.RED + "Error: " + colorama.Fore.GREEN + f"{e.__class__.__name__}: {e}" + colorama.Fore.MAGENTA + f" at line {e.__traceback__.tb_lineno}")
-                            return await interaction.response.send_message(lang["error_occurred"], ephemeral=True)
-                    await interaction.response.send_message(lang["role_added"].replace("{{role}}", role.mention), ephemeral=True)
-                elif "custom_id" in interaction.data and interaction.data["custom_id"].startswith("toggle_button_role_"):
-                    role = discord.utils.get(interaction.guild.roles,id=int(interaction.data["custom_id"].replace("toggle_button_role_", "")))
-                    if role in interaction.user.roles:
-                        await interaction.user.remove_roles(role)
-                        return await interaction.response.send_message(lang["role_removed"].replace("{{role}}", role.mention), ephemeral=True)
-                    try:
-                        await interaction.user.add_roles(role)
-                    except Exception as e:
-                        if isinstance(e, discord.Forbidden):
-                            return await interaction.response.send_message(lang["missing_permission"], ephemeral=True)
-                        else:
-                            print(colorama.Fore.RED + "Error: " + colorama.Fore.GREEN + f"{e.__class__.__name__}: {e}" + colorama.Fore.MAGENTA + f" at line {e.__traceback__.tb_lineno}")
-                            return await interaction.response.send_message(lang["error_occurred"], ephemeral=True)
-                    await interaction.response.send_message(lang["role_added"].replace("{{role}}", role.mention), ephemeral=True)
+        if interaction.type != discord.InteractionType.component or interaction.data.get("component_type") != 2:
+            return
+        if interaction.message is not None and (interaction.message.id in role_buttons or interaction.message.id in role_selects):  # Handled by the persistent view
+            return
+        await handle_role_button(interaction, interaction.data.get("custom_id", ""))
+
+    async def on_member_update(before: discord.Member, after: discord.Member):
+        # Only an early invalidation: on a bot core that does not dispatch on_member_update_callbacks,
+        # a role change still reaches has_access once the entry expires after ACCESS_CACHE_TTL
+        if before.roles != after.roles:
+            access_cache.pop((after.guild.id, after.id), None)
+
+    if not hasattr(bot, "on_member_update_callbacks"):
+        bot.on_member_update_callbacks = []
+    bot.on_member_update_callbacks.append(on_member_update)
+
     if not hasattr(bot, "on_interaction_callbacks"):
         bot.on_interaction_callbacks = []
     bot.on_interaction_callbacks.append(on_interaction)
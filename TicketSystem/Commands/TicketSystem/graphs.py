@@ -0,0 +1,94 @@
+import asyncio
+import concurrent.futures
+import datetime
+import io
+from collections import OrderedDict
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+
+# Claim graphs are drawn in worker processes with the object-oriented Agg API, so a render never blocks the bot
+# and there is no global pyplot state shared between concurrent renders.
+
+GRAPH_WORKERS = 2
+GRAPH_CACHE_SIZE = 32  # rendered PNGs kept in memory
+
+executor = None
+graph_cache = OrderedDict()  # key -> PNG bytes, least recently used first
+
+
+def render_claims_graph(dates: list[str], counts: list[int], title: str, xlabel: str, ylabel: str) -> bytes:
+    """
+    Draw the daily claims of one staff member
+    :param dates: list[str] the day labels, one per day without gaps
+    :param counts: list[int] the claims of each day
+    :return: bytes the PNG image
+    """
+    figure = Figure()
+    ax = figure.add_subplot()
+    x_positions = list(range(len(dates)))
+    x_positions_scatter = [i for i in x_positions if counts[i] != 0 or (i > 0 and counts[i-1] != 0) or (i < len(counts) - 1 and counts[i+1] != 0)] # Generate scatter points only when the previous or next day had claims
+    ax.plot(x_positions, counts, zorder=1)
+    ax.scatter(x_positions_scatter, [counts[i] for i in x_positions_scatter], color="red", zorder=2)
+    ax.set_xticks(x_positions)
+    ax.set_xticklabels(dates, rotation=45)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    figure.tight_layout()
+    image_stream = io.BytesIO()
+    figure.savefig(image_stream, format="png")
+    return image_stream.getvalue()
+
+
+def render_top10_graph(dates: list[datetime.date], series: list[tuple[str, list[int]]], title: str, xlabel: str, ylabel: str) -> bytes:
+    """
+    Draw the daily claims of the top staff members, one line each
+    :param dates: list[datetime.date] every day of the graph without gaps
+    :param series: list[tuple[str, list[int]]] (name, claims of each day) per staff member
+    :return: bytes the PNG image
+    """
+    figure = Figure(figsize=(8, 5))
+    ax = figure.add_subplot()
+    for name, counts in series:
+        ax.plot(dates, counts, marker='o', label=name)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend()  # Show legend with usernames
+    ax.grid(True)  # Add grid for readability
+    figure.tight_layout()
+    image_stream = io.BytesIO()
+    figure.savefig(image_stream, format="png")
+    return image_stream.getvalue()
+
+
+def get_executor() -> concurrent.futures.ProcessPoolExecutor:
+    global executor
+    if executor is None:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=GRAPH_WORKERS)
+    return executor
+
+
+async def render(key: tuple, function, *args) -> bytes:
+    """
+    Render a graph in the process pool, or return the cached PNG rendered for the same key
+    :param key: tuple everything the image depends on (graph kind, user, claims data version, labels)
+    :param function: the render_* function to run
+    :return: bytes the PNG image
+    """
+    global executor
+    image = graph_cache.get(key)
+    if image is not None:
+        graph_cache.move_to_end(key)
+        return image
+    try:
+        image = await asyncio.get_running_loop().run_in_executor(get_executor(), function, *args)
+    except concurrent.futures.process.BrokenProcessPool:
+        executor = None  # A worker died, start a fresh pool on the next render
+        raise
+    graph_cache[key] = image
+    if len(graph_cache) > GRAPH_CACHE_SIZE:
+        graph_cache.popitem(last=False)
+    return image
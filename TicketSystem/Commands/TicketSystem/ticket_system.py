@@ -1,5 +1,5 @@
+import asyncio
 import json
-from collections import Counter
 import discord
 import typing
 import io
@@ -7,10 +7,17 @@ import colorama
 import sqlite3
 import utils
 import datetime
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import time
 from bidi.algorithm import get_display
-from collections import Counter, defaultdict
+import Commands.TicketSystem.graphs as graphs
+from collections import defaultdict
+
+TRANSCRIPT_PAGE_SIZE = 100  # transcript rows written per executemany
+TRANSCRIPT_FLUSH_DELAY = 5  # seconds a captured message may wait in the write-behind buffer
+USER_NAME_TTL = 600  # seconds a resolved display name is reused
+USER_FETCH_CONCURRENCY = 4  # fetch_user requests in flight for names missing from the cache
+WARM_POOL_CHANNEL_NAME = "ticket-pool"  # name of the hidden pre-created channels, used to adopt them again after a restart
+TRANSCRIPT_INSERT = "INSERT INTO ticketMessages (channel_id, message_id, author_id, author_name, author_image, content, timestamp, embed_title, embed_color, embed_description, embed_footer, embed_image_url, embed_thumbnail_url, embed_icon_url, embed_icon_text) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
 
 def is_rtl(text):
     rtl_ranges = [
@@ -23,10 +30,155 @@ def is_rtl(text):
     ]
     return any(any(start <= ord(char) <= end for start, end in rtl_ranges) for char in text)
 
+def graph_text(text: str) -> str:
+    return text if not is_rtl(text) else get_display(text)
+
+# Schema migrations, applied in order by migrate_schema. Never edit a released step, append a new one instead.
+SCHEMA_MIGRATIONS = [
+    [  # 1: the original tables
+        "CREATE TABLE IF NOT EXISTS ticketsTicketSystem (channel_id INTEGER PRIMARY KEY, owner_id INTEGER not null, claimed_by integer default null, claim_time timestamp default null, close_time timestamp default null, closed_by integer default null, closed boolean default false)",
+        "CREATE TABLE IF NOT EXISTS ticketMessages (id INTEGER PRIMARY KEY AUTOINCREMENT,message_id INTEGER,channel_id INTEGER,author_id INTEGER,author_name TEXT,author_image TEXT,content TEXT,embed_title TEXT,embed_color TEXT,embed_description TEXT,embed_fields TEXT,embed_image_url TEXT,embed_thumbnail_url TEXT,embed_footer TEXT,embed_icon_url TEXT,embed_icon_text TEXT,timestamp TEXT)",
+    ],
+    [  # 2: indexes for the open ticket lookup, the claims commands and the transcripts
+        "CREATE INDEX IF NOT EXISTS idx_tickets_owner_closed ON ticketsTicketSystem (owner_id, closed)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_claimed_by ON ticketsTicketSystem (claimed_by, claim_time)",
+        "CREATE INDEX IF NOT EXISTS idx_ticket_messages_channel ON ticketMessages (channel_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_ticket_messages_message ON ticketMessages (message_id)",
+    ],
+    [  # 3: daily claim counts, kept up to date by the claim button and backfilled from the existing claims
+        "CREATE TABLE IF NOT EXISTS ticketClaimsDaily (user_id INTEGER NOT NULL, day TEXT NOT NULL, count INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, day))",
+        "INSERT OR REPLACE INTO ticketClaimsDaily (user_id, day, count) SELECT claimed_by, date(claim_time), COUNT(*) FROM ticketsTicketSystem WHERE claimed_by IS NOT NULL AND claim_time IS NOT NULL GROUP BY claimed_by, date(claim_time)",
+    ],
+    [  # 4: panel category of each ticket, for the open ticket index
+        "ALTER TABLE ticketsTicketSystem ADD COLUMN category TEXT DEFAULT NULL",
+    ],
+    [  # 5: open tickets are looked up in memory and claims in ticketClaimsDaily, index what the queries use now
+        "DROP INDEX IF EXISTS idx_tickets_owner_closed",
+        "DROP INDEX IF EXISTS idx_tickets_claimed_by",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_open ON ticketsTicketSystem (closed) WHERE closed = false",
+        "CREATE INDEX IF NOT EXISTS idx_ticket_messages_channel_message ON ticketMessages (channel_id, message_id)",
+    ],
+    [  # 6: claim totals per user, kept up to date by the claim button, so the top 10 reads 10 index entries
+        "CREATE TABLE IF NOT EXISTS ticketClaimsTotal (user_id INTEGER PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0)",
+        "CREATE INDEX IF NOT EXISTS idx_ticket_claims_total_count ON ticketClaimsTotal (count)",
+        "INSERT OR REPLACE INTO ticketClaimsTotal (user_id, count) SELECT user_id, SUM(count) FROM ticketClaimsDaily GROUP BY user_id",
+    ],
+]
+
+def migrate_schema(db: sqlite3.Cursor):
+    """
+    Bring the ticket tables up to the latest schema version, recorded in ticketSystemSchema
+    :param db: the database
+    :return: None
+    """
+    db.execute("CREATE TABLE IF NOT EXISTS ticketSystemSchema (version INTEGER NOT NULL)")
+    row = db.execute("SELECT version FROM ticketSystemSchema").fetchone()
+    if row is None:
+        db.execute("INSERT INTO ticketSystemSchema (version) VALUES (0)")
+        version = 0
+    else:
+        version = row[0]
+    for number, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        for statement in statements:
+            db.execute(statement)
+        db.execute("UPDATE ticketSystemSchema SET version = ?", (number,))
+        db.commit()  # One commit per step, so a failed step is retried on the next start
+        print(colorama.Fore.GREEN + f"[+] TicketSystem: Database schema migrated to version {number}")
+
+def parse_role_ids(conf: dict) -> frozenset[int]:
+    """
+    Parse the configured support role ids once, so permission checks are a set lookup
+    :param conf: dict the ticket system config
+    :return: frozenset[int] the support role ids
+    """
+    return frozenset(int(role_id) for role_id in conf.get("support_roles", None) or [] if role_id)
+
+def transcript_rows(message: discord.Message) -> list[tuple]:
+    """
+    Turn a message into its ticketMessages rows: one row, or one row per embed.
+    Columns: channel_id, message_id, author_id, author_name, author_image, content, timestamp, embed_title, embed_color,
+    embed_description, embed_footer, embed_image_url, embed_thumbnail_url, embed_icon_url, embed_icon_text
+    """
+    base = (message.channel.id, message.id, message.author.id, message.author.name, message.author.display_avatar.url, message.content, message.created_at.strftime("%Y-%m-%d %H:%M:%S"))
+    if not message.embeds:
+        return [base + (None,) * 8]
+    return [base + (
+        embed.title if embed.title else None,
+        f'#{embed.color.value:06x}' if embed.color else None,
+        embed.description if embed.description else None,
+        embed.footer.text if embed.footer else None,
+        embed.image.url if embed.image else None,
+        embed.thumbnail.url if embed.thumbnail else None,
+        embed.author.icon_url if embed.author and embed.author.icon_url else None,
+        embed.author.name if embed.author else None,
+    ) for embed in message.embeds]
+
+class TokenBucket:
+    """
+    Guild-wide limiter for ticket channel creation: up to capacity channels at once, then rate channels per second.
+    Waiters are served in arrival order, so a queue position can be reported to them.
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self.lock = asyncio.Lock()  # asyncio.Lock wakes its waiters first in, first out
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def queue_position(self) -> int:
+        """
+        :return: int the position a new request would get in the queue, 0 if it would go through right away
+        """
+        self.refill()
+        if self.waiting == 0 and self.tokens >= 1:
+            return 0
+        return self.waiting + 1
+
+    def has_spare_token(self) -> bool:
+        """
+        :return: bool whether background work can take a token without delaying anyone: nobody is waiting and a token is left for the next request
+        """
+        self.refill()
+        return self.waiting == 0 and self.tokens >= min(2, self.capacity)
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            async with self.lock:
+                self.refill()
+                if self.tokens < 1:
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+                    self.refill()
+                self.tokens -= 1
+        finally:
+            self.waiting -= 1
+
 def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: dict, lang: dict, db: sqlite3.Cursor):
     """
     Sets up the ticket system commands and views.
     """
+    support_role_ids = {"ids": parse_role_ids(config)}  # Reloaded in on_ready, after the setup wizard rewrites the config
+    creation_rate = float(config.get("ticket_creation_rate", 1) or 1)
+    creation_burst = max(1, int(config.get("ticket_creation_burst", 5) or 5))
+    creation_buckets = {}  # guild_id -> TokenBucket
+    warm_pool_size = max(0, int(config.get("warm_pool_size", 0) or 0))
+    warm_pools = {}  # category_id -> list of hidden pre-created channels, taken by create_ticket
+    warm_pool_task = {"task": None}
+    creating_tickets = set()  # ids of the users whose ticket is being created, so double clicks are rejected
+    open_tickets = {}  # channel_id -> {"owner_id", "claimed_by", "category"} of every open ticket, loaded in on_ready
+    open_ticket_owners = {}  # owner_id -> channel_id of their open ticket
+    transcript_buffer = []  # write-behind buffer of ticketMessages rows, flushed by size or after TRANSCRIPT_FLUSH_DELAY
+    flush_task = {"task": None}
+    backfill_from = {}  # channel_id -> last message id stored before this start, recorded in on_ready before live capture
+    claims_version = {"version": 0}  # Bumped on every claim, part of the rendered graph cache key
+    user_names_cache = {}  # user_id -> (display name, expiry)
+
     ticket_commands = discord.app_commands.Group(name="ticket", description=lang["command_description"])
 
     @ticket_commands.command(name="setup", description=lang["setup_command_description"])
@@ -55,15 +207,9 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
     @ticket_commands.command(name="remove", description=lang["remove_command_description"])
     @discord.app_commands.describe(member=lang["member_remove_description"])
     async def ticket_remove(interaction: discord.Interaction, member: discord.Member):
-
-        flag = False
-        for role_id in config.get("support_roles", []):
-            role = interaction.guild.get_role(int(role_id))
-            if role in member.roles:
-                flag = True
-                break
-        if not flag:
+        if not interaction_is_support_staff(interaction):
             await interaction.response.send_message(lang["no_permission_remove"], ephemeral=True)
+            return
 
         if not is_ticket_channel(interaction.channel):
             await interaction.response.send_message(lang["not_in_ticket_channel"], ephemeral=True)
@@ -78,14 +224,7 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
         if not is_ticket_channel(interaction.channel):
             return await interaction.response.send_message(lang["not_in_ticket_channel"], ephemeral=True)
 
-        flag = False
-        for role_id in config.get("support_roles", []):
-            role = interaction.guild.get_role(int(role_id))
-            if role in interaction.user.roles:
-                flag = True
-                break
-
-        if not flag:
+        if not interaction_is_support_staff(interaction):
             return await interaction.response.send_message(lang["no_permission_rename"], ephemeral=True)
         await interaction.channel.edit(name=f"ticket-{name}")
         await interaction.response.send_message(lang["ticket_renamed"].format(new_name=name), ephemeral=True)
@@ -96,12 +235,12 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
             await interaction.response.send_message(lang["not_in_ticket_channel"], ephemeral=True)
             return
 
-        if not await can_close_ticket(interaction.user, interaction.channel, config):
+        if not await can_close_ticket(interaction):
             await interaction.response.send_message(lang["no_permission_close"], ephemeral=True)
             return
 
+        await interaction.response.send_message(lang["ticket_closed"], ephemeral=True)  # Answered before the close work, like the close button
         await close_ticket(interaction.channel, interaction.user, config, lang)
-        await interaction.response.send_message(lang["ticket_closed"], ephemeral=True)
 
     tree.add_command(ticket_commands)
 
@@ -109,118 +248,67 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
 
     @claims_commands.command(name="show", description=lang["claims_command_description"])
     async def claims_show(interaction: discord.Interaction, user: discord.Member = None):
-        if not is_support_staff(interaction.user, config):
+        if not interaction_is_support_staff(interaction):
             await interaction.response.send_message(lang["no_permission_command"], ephemeral=True)
             return
 
         if user is None:
             user = interaction.user
 
-        claims = db.execute("SELECT claim_time FROM ticketsTicketSystem WHERE claimed_by = ? AND claim_time IS NOT NULL", (user.id,)).fetchall()
+        claims = db.execute("SELECT day, count FROM ticketClaimsDaily WHERE user_id = ? ORDER BY day", (user.id,)).fetchall()
 
         if not claims:
             return await interaction.response.send_message(lang["no_claims"].format(user_mention=user.mention), ephemeral=True)
-        claims_dt = [datetime.datetime.fromisoformat(dt[0]) for dt in claims]
-        pre_sorted_dates = Counter(dt.strftime("%d/%m/%Y") for dt in claims_dt)
-        min_date, max_date = min(claims_dt), max(claims_dt)
+        claims_per_day = {datetime.date.fromisoformat(day): count for day, count in claims}
+        min_date, max_date = min(claims_per_day), max(claims_per_day)
 
         sorted_dates = {
-            (min_date + datetime.timedelta(days=i)).strftime("%d/%m/%Y"): pre_sorted_dates.get((min_date + datetime.timedelta(days=i)).strftime("%d/%m/%Y"), 0)
+            (min_date + datetime.timedelta(days=i)).strftime("%d/%m/%Y"): claims_per_day.get(min_date + datetime.timedelta(days=i), 0)
             for i in range((max_date - min_date).days + 1)
         }
 
-        x_positions = range(len(sorted_dates))
-        y_values = list(sorted_dates.values())
-        x_positions_scatter = [i for i in range(len(y_values)) if y_values[i] != 0 or (i > 0 and y_values[i-1] != 0) or (i < len(y_values) - 1 and y_values[i+1] != 0)] # Generate scatter points only when the previous or next day had claims
-        y_positions_scatter = [y_values[i] for i in x_positions_scatter]
-
-        plt.plot(x_positions, list(sorted_dates.values()), zorder=1)
-        plt.scatter(x_positions_scatter, y_positions_scatter, color="red", zorder=2)
-
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))  # Keep YYYY-MM-DD format
-        plt.xticks(ticks=x_positions, labels=list(sorted_dates.keys()), rotation=45)
-        plt.xlabel(lang["graph_date"] if not is_rtl(lang["graph_date"]) else get_display(lang["graph_date"]))
-        plt.ylabel(lang["graph_claims_num"] if not is_rtl(lang["graph_claims_num"]) else get_display(lang["graph_claims_num"]))
-        plt.title(lang["graph_title"].format(user_name=user.display_name) if not is_rtl(lang["graph_title"]) else get_display(lang["graph_title"]).format(user_name=user.display_name))
-
-        plt.tight_layout()
-
-        # stream the plot to a bytes object
-        image_stream = io.BytesIO()
-        plt.savefig(image_stream, format="png")
-        plt.close()
-        image_stream.seek(0)
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        title = lang["graph_title"].format(user_name=user.display_name) if not is_rtl(lang["graph_title"]) else get_display(lang["graph_title"]).format(user_name=user.display_name)
+        labels = (title, graph_text(lang["graph_date"]), graph_text(lang["graph_claims_num"]))
+        image = await graphs.render(("show", user.id, claims_version["version"]) + labels, graphs.render_claims_graph, list(sorted_dates.keys()), list(sorted_dates.values()), *labels)
+        image_stream = io.BytesIO(image)
 
         embed = discord.Embed(title=lang["embed_claims_title"], color=discord.Color.blue(), description=lang["embed_claims_description"].format(user_mention=user.mention))
         file = discord.File(image_stream, filename="claims_graph.png")
         embed.set_image(url="attachment://claims_graph.png")
 
-        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+        await interaction.followup.send(embed=embed, file=file, ephemeral=True)
 
     @claims_commands.command(name="top10", description=lang["claims_top10_command_description"])
     async def claims_top10(interaction: discord.Interaction):
-        if not is_support_staff(interaction.user, config):
+        if not interaction_is_support_staff(interaction):
             await interaction.response.send_message(lang["no_permission_command"], ephemeral=True)
             return
 
-        # Retrieve claims grouped by user
-        claims = db.execute("SELECT claimed_by, claim_time FROM ticketsTicketSystem WHERE claim_time IS NOT NULL").fetchall()
+        # Top 10 users by total claims
+        top_users = [row[0] for row in db.execute("SELECT user_id FROM ticketClaimsTotal ORDER BY count DESC LIMIT 10").fetchall()]
 
-        if not claims:
+        if not top_users:
             return await interaction.response.send_message(lang["no_claims_found"], ephemeral=True)
 
-        # Count claims per user
-        claim_counts = Counter(user_id for user_id, _ in claims)
-        top_users = [user_id for user_id, _ in claim_counts.most_common(10)]  # Get top 10 users
-
-        # Retrieve usernames
-        user_names = {}
-        for user_id in top_users:
-            user = await interaction.client.fetch_user(user_id)  # Get user object from ID
-            user_names[user_id] = user.display_name if user else f"Unknown ({user_id})"
-
-        # Prepare data for visualization
-        user_claims = defaultdict(list)  # Store claim times per user
-        for user_id, claim_time in claims:
-            if user_id in top_users:
-                user_claims[user_id].append(datetime.datetime.fromisoformat(claim_time))
+        await interaction.response.defer(ephemeral=True, thinking=True)  # Name lookups and rendering can take longer than the 3 seconds deadline
+        user_names = await resolve_user_names(interaction.guild, top_users)
 
-        plt.figure(figsize=(8, 5))
+        # Daily counts of the top users
+        user_claims = defaultdict(dict)  # user_id -> {date: count}
+        for user_id, day, count in db.execute(f"SELECT user_id, day, count FROM ticketClaimsDaily WHERE user_id IN ({', '.join('?' * len(top_users))})", top_users).fetchall():
+            user_claims[user_id][datetime.date.fromisoformat(day)] = count
 
         # Create a full date range to fill gaps
-        all_claims = [dt for times in user_claims.values() for dt in times]  # Flatten list
-        if not all_claims:
-            return await interaction.response.send_message(lang["no_claims_found"], ephemeral=True)
-
-        min_date, max_date = min(all_claims).date(), max(all_claims).date()
+        all_claims = [date for days in user_claims.values() for date in days]  # Flatten list
+        min_date, max_date = min(all_claims), max(all_claims)
         full_dates = [min_date + datetime.timedelta(days=i) for i in range((max_date - min_date).days + 1)]
 
-        # Plot each user's claim history as a line
-        for user_id, claim_times in user_claims.items():
-            # Convert claim times to daily counts
-            claim_counts_per_day = Counter(dt.date() for dt in claim_times)
-            y_values = [claim_counts_per_day.get(date, 0) for date in full_dates]  # Fill missing days with 0
-
-            plt.plot(full_dates, y_values, marker='o', label=user_names[user_id])  # Plot line with markers
-
-        # Format x-axis as dates
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
-        plt.xticks(rotation=45)
-
-        # Labels and Title
-        plt.xlabel(lang["graph_top10_x"] if not is_rtl(lang["graph_top10_x"]) else get_display(lang["graph_top10_x"]))
-        plt.ylabel(lang["graph_top10_y"] if not is_rtl(lang["graph_top10_y"]) else get_display(lang["graph_top10_y"]))
-        plt.title(lang["graph_top10_title"] if not is_rtl(lang["graph_top10_title"]) else get_display(lang["graph_top10_title"]))
-
-        plt.legend()  # Show legend with usernames
-        plt.grid(True)  # Add grid for readability
-        plt.tight_layout()
-
-        # Save the graph to a bytes object
-        image_stream = io.BytesIO()
-        plt.savefig(image_stream, format="png")
-        plt.close()
-        image_stream.seek(0)
+        # One line per user, missing days filled with 0
+        series = [(user_names[user_id], [user_claims[user_id].get(date, 0) for date in full_dates]) for user_id in top_users]
+        labels = (graph_text(lang["graph_top10_title"]), graph_text(lang["graph_top10_x"]), graph_text(lang["graph_top10_y"]))
+        key = ("top10", tuple(name for name, _ in series), claims_version["version"]) + labels
+        image_stream = io.BytesIO(await graphs.render(key, graphs.render_top10_graph, full_dates, series, *labels))
 
         # Send embed with graph
         embed = discord.Embed(
@@ -231,15 +319,64 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
         file = discord.File(image_stream, filename="top10_claims.png")
         embed.set_image(url="attachment://top10_claims.png")
 
-        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+        await interaction.followup.send(embed=embed, file=file, ephemeral=True)
 
     tree.add_command(claims_commands)
 
+    async def resolve_user_names(guild: discord.Guild, user_ids: list[int]) -> dict[int, str]:
+        """
+        Get the display names of users, from the name cache, the member and user caches, and only then the API
+        :param guild: discord.Guild the guild to look members up in
+        :param user_ids: list[int] the users
+        :return: dict[int, str] user_id -> display name
+        """
+        now = time.monotonic()
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            cached = user_names_cache.get(user_id)
+            if cached is not None and cached[1] > now:
+                names[user_id] = cached[0]
+                continue
+            user = guild.get_member(user_id) or bot.get_user(user_id)
+            if user is not None:
+                names[user_id] = user.display_name
+                user_names_cache[user_id] = (user.display_name, now + USER_NAME_TTL)
+            else:
+                missing.append(user_id)
+
+        semaphore = asyncio.Semaphore(USER_FETCH_CONCURRENCY)
+
+        async def fetch_name(user_id: int) -> str:
+            async with semaphore:
+                try:
+                    return (await bot.fetch_user(user_id)).display_name
+                except discord.NotFound:
+                    return f"Unknown ({user_id})"
+
+        for user_id, name in zip(missing, await asyncio.gather(*(fetch_name(user_id) for user_id in missing))):
+            names[user_id] = name
+            user_names_cache[user_id] = (name, now + USER_NAME_TTL)
+        return names
+
     async def on_ready():
-        db.execute("CREATE TABLE IF NOT EXISTS ticketsTicketSystem (channel_id INTEGER PRIMARY KEY, owner_id INTEGER not null, claimed_by integer default null, claim_time timestamp default null, close_time timestamp default null, closed_by integer default null, closed boolean default false)")
-        db.commit()
-        db.execute("CREATE TABLE IF NOT EXISTS ticketMessages (id INTEGER PRIMARY KEY AUTOINCREMENT,message_id INTEGER,channel_id INTEGER,author_id INTEGER,author_name TEXT,author_image TEXT,content TEXT,embed_title TEXT,embed_color TEXT,embed_description TEXT,embed_fields TEXT,embed_image_url TEXT,embed_thumbnail_url TEXT,embed_footer TEXT,embed_icon_url TEXT,embed_icon_text TEXT,timestamp TEXT)")
-        db.commit()
+        migrate_schema(db)
+        support_role_ids["ids"] = parse_role_ids(config)
+        open_tickets.clear()
+        open_ticket_owners.clear()
+        flush_transcripts()
+        backfill_from.clear()
+        for channel_id, owner_id, claimed_by, category in db.execute("SELECT channel_id, owner_id, claimed_by, category FROM ticketsTicketSystem WHERE closed = false").fetchall():
+            open_tickets[channel_id] = {"owner_id": owner_id, "claimed_by": claimed_by, "category": category}
+            open_ticket_owners[owner_id] = channel_id
+            # Read with no await since open_tickets was filled, so on_message can't have stored a live message yet
+            backfill_from[channel_id] = db.execute("SELECT MAX(message_id) FROM ticketMessages WHERE channel_id = ?", (channel_id,)).fetchone()[0]
+        asyncio.create_task(backfill_open_tickets())
+        if warm_pool_size:
+            warm_pools.clear()
+            for category in warm_pool_categories():
+                warm_pools[category.id] = [channel for channel in category.text_channels if channel.name == WARM_POOL_CHANNEL_NAME and channel.id not in open_tickets]
+            schedule_warm_pool_refill()
         channel_id = int(config.get("ticket_panel_channel_id"))
         if channel_id is None:
             print(colorama.Fore.YELLOW + "[!] TicketSystem: Ticket panel channel ID not set.")
@@ -304,21 +441,12 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
 
     async def create_ticket(interaction: discord.Interaction, category_name: typing.Optional[str], conf, lang):
 
-        if db.execute("SELECT * FROM ticketsTicketSystem WHERE owner_id = ? AND closed = false", (interaction.user.id,)).fetchone():
+        if interaction.user.id in open_ticket_owners:
             return await interaction.response.send_message(lang["ticket_already_open"], ephemeral=True)
+        if interaction.user.id in creating_tickets:
+            return await interaction.response.send_message(lang["ticket_creation_in_progress"], ephemeral=True)
 
         guild = interaction.guild
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(read_messages=False),
-            interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-        }
-
-        support_role_ids = conf.get("support_roles", [])
-        for role_id in support_role_ids:
-            role = guild.get_role(int(role_id))
-            if role:
-                overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-
         if category_name and conf.get("enable_categories", False):
             category_id = int(conf.get("categories", {}).get(category_name))
             if category_id:
@@ -334,8 +462,37 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
             await interaction.response.send_message(lang["category_not_found"], ephemeral=True)
             return
 
-        channel_name = f"ticket-{interaction.user.name.lower()}"
-        ticket_channel = await guild.create_text_channel(channel_name, overwrites=overwrites, category=category)
+        creating_tickets.add(interaction.user.id)
+        try:
+            overwrites = {
+                guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
+            }
+
+            for role_id in support_role_ids["ids"]:
+                role = guild.get_role(role_id)
+                if role:
+                    overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+
+            channel_name = f"ticket-{interaction.user.name.lower()}"
+            ticket_channel = await take_warm_channel(category, channel_name, overwrites)
+            if ticket_channel is None:
+                bucket = creation_bucket(guild)
+                position = bucket.queue_position()
+                if position:
+                    await interaction.response.send_message(lang["ticket_queue_position"].format(position=position), ephemeral=True)
+                await bucket.acquire()
+                ticket_channel = await guild.create_text_channel(channel_name, overwrites=overwrites, category=category)
+            open_tickets[ticket_channel.id] = {"owner_id": interaction.user.id, "claimed_by": None, "category": category_name}
+            open_ticket_owners[interaction.user.id] = ticket_channel.id
+        finally:
+            creating_tickets.discard(interaction.user.id)
+
+        # Answer as soon as the channel exists, the welcome message is not needed for that
+        if interaction.response.is_done():  # The user was told their queue position
+            await interaction.edit_original_response(content=lang["ticket_opened"].format(channel=ticket_channel.mention))
+        else:
+            await interaction.response.send_message(lang["ticket_opened"].format(channel=ticket_channel.mention), ephemeral=True)
 
         embed = discord.Embed(title=lang["ticket_created_title"], description=lang["ticket_created_description"].format(user=interaction.user.mention), color=discord.Color.green())
         channel_id = ticket_channel.id
@@ -345,11 +502,70 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
         # Register the ticket channel view
         bot.add_view(view)
 
-        await interaction.response.send_message(lang["ticket_opened"].format(channel=ticket_channel.mention), ephemeral=True)
-
-        db.execute("INSERT INTO ticketsTicketSystem (channel_id, owner_id) VALUES (?, ?)", (channel_id, interaction.user.id))
+        db.execute("INSERT INTO ticketsTicketSystem (channel_id, owner_id, category) VALUES (?, ?, ?)", (channel_id, interaction.user.id, category_name))
         db.commit()
 
+    def creation_bucket(guild: discord.Guild) -> TokenBucket:
+        bucket = creation_buckets.get(guild.id)
+        if bucket is None:
+            bucket = creation_buckets[guild.id] = TokenBucket(creation_rate, creation_burst)
+        return bucket
+
+    def warm_pool_categories() -> list[discord.CategoryChannel]:
+        if config.get("enable_categories", False):
+            category_ids = (config.get("categories", None) or {}).values()
+        else:
+            category_ids = [config.get("ticket_category_id")]
+        categories = [bot.get_channel(int(category_id)) for category_id in category_ids if category_id]
+        return [category for category in categories if isinstance(category, discord.CategoryChannel)]
+
+    async def take_warm_channel(category: discord.CategoryChannel, name: str, overwrites: dict) -> discord.TextChannel | None:
+        """
+        Turn a pre-created channel of the category into a ticket with a single edit
+        :param category: discord.CategoryChannel the ticket category
+        :param name: str the ticket channel name
+        :param overwrites: dict the ticket permission overwrites
+        :return: discord.TextChannel the ticket channel, or None when the pool is empty
+        """
+        pool = warm_pools.get(category.id)
+        while pool:
+            channel = pool.pop()
+            try:
+                await channel.edit(name=name, overwrites=overwrites)
+            except discord.NotFound:  # Deleted by hand, try the next one
+                continue
+            schedule_warm_pool_refill()
+            return channel
+        return None
+
+    def schedule_warm_pool_refill():
+        if warm_pool_size and (warm_pool_task["task"] is None or warm_pool_task["task"].done()):
+            warm_pool_task["task"] = asyncio.create_task(refill_warm_pools())
+
+    async def refill_warm_pools():
+        """
+        Create hidden channels until every ticket category has warm_pool_size of them, with the creation tokens users don't need
+        :return: None
+        """
+        try:
+            while True:
+                missing = [category for category in warm_pool_categories() if len(warm_pools.setdefault(category.id, [])) < warm_pool_size]
+                if not missing:
+                    return
+                for category in missing:
+                    bucket = creation_bucket(category.guild)
+                    while not bucket.has_spare_token():  # Users opening tickets go first, the pool only uses idle capacity
+                        await asyncio.sleep(1 / bucket.rate)
+                    await bucket.acquire()
+                    overwrites = {
+                        category.guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                        category.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True),
+                    }
+                    channel = await category.guild.create_text_channel(WARM_POOL_CHANNEL_NAME, overwrites=overwrites, category=category)
+                    warm_pools[category.id].append(channel)
+        except Exception as e:
+            print(colorama.Fore.RED + f"[-] TicketSystem: Error refilling the warm ticket channel pool: {e}")
+
     class TicketChannelView(discord.ui.View):
         def __init__(self, conf, lang):
             super().__init__(timeout=None)
@@ -368,69 +584,151 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
             ))
 
     def is_ticket_channel(channel: discord.TextChannel) -> bool:
-        return channel.name.startswith("ticket-")
+        return channel.id in open_tickets
 
-    async def can_close_ticket(user: discord.Member, channel: discord.TextChannel, conf) -> bool:
-        res = db.execute("SELECT * FROM ticketsTicketSystem WHERE channel_id = ?", (channel.id,))
-        ticket = res.fetchone()
-        if not ticket:
+    async def can_close_ticket(interaction: discord.Interaction) -> bool:
+        ticket = open_tickets.get(interaction.channel.id)
+        if ticket is None:
             return False
-        if ticket[1] == user.id:
+        if ticket["owner_id"] == interaction.user.id:
             return True
-        support_role_ids = conf.get("support_roles", [])
-        for role_id in support_role_ids:
-            role = user.guild.get_role(int(role_id))
-            if role in user.roles:
-                return True
-        return False
+        return interaction_is_support_staff(interaction)
 
     async def close_ticket(channel: discord.TextChannel, closed_by: discord.Member, conf, lang):
-        messages = [msg async for msg in channel.history(limit=None, oldest_first=True)]
-        for message in messages:
-            timestamp = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            author_id = message.author.id
-            author_name = message.author.name
-            content = message.content
-            embeds = message.embeds
-
-            if not embeds:
-                db.execute(
-                    """
-                    INSERT INTO ticketMessages (channel_id, message_id, author_id, author_name, author_image, content, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (channel.id, message.id, author_id, author_name, message.author.avatar.url, content, timestamp)
-                )
-            else:
-                for i, embed in enumerate(embeds):
-                    db.execute("INSERT INTO ticketMessages (channel_id, message_id, author_id, author_name, author_image, content, timestamp, embed_title, embed_color, embed_description, embed_footer, embed_image_url, embed_thumbnail_url, embed_icon_url, embed_icon_text) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (
-                        channel.id,
-                        message.id,
-                        author_id,
-                        author_name,
-                        message.author.avatar.url,
-                        content,
-                        timestamp,
-                        embed.title if embed.title else None,
-                        f'#{embed.color.value:06x}' if embed.color else None,
-                        embed.description if embed.description else None,
-                        embed.footer.text if embed.footer else None,
-                        embed.image.url if embed.image else None,
-                        embed.thumbnail.url if embed.thumbnail else None,
-                        embed.author.icon_url if embed.author and embed.author.icon_url else None,
-                        embed.author.name if embed.author else None,
-
-                    ))
-
-
+        flush_transcripts()
+        last_id = db.execute("SELECT MAX(message_id) FROM ticketMessages WHERE channel_id = ?", (channel.id,)).fetchone()[0]
+        await backfill_transcript(channel, last_id)  # Normally a single empty history page, the transcript was captured live
+        ticket = open_tickets.pop(channel.id, None)
+        if ticket is not None and open_ticket_owners.get(ticket["owner_id"]) == channel.id:
+            del open_ticket_owners[ticket["owner_id"]]
         db.execute("UPDATE ticketsTicketSystem SET closed = true, close_time = datetime('now'), closed_by = ? WHERE channel_id = ?", (closed_by.id, channel.id))
         db.commit()
         await channel.delete()
 
+    def flush_transcripts():
+        """
+        Write the buffered transcript rows in one executemany
+        :return: None
+        """
+        if not transcript_buffer:
+            return
+        db.executemany(TRANSCRIPT_INSERT, transcript_buffer)
+        db.commit()
+        transcript_buffer.clear()
+
+    async def delayed_flush():
+        await asyncio.sleep(TRANSCRIPT_FLUSH_DELAY)
+        flush_transcripts()
+
+    async def backfill_transcript(channel: discord.TextChannel, last_id: int | None):
+        """
+        Capture the messages sent in a ticket channel while the bot was not listening (downtime, or tickets opened before live capture).
+        A fetcher task walks the history and hands pages of rows to the writer through a queue of at most two pages,
+        so the next page is fetched while the current one is written and memory stays constant whatever the gap length.
+        :param channel: discord.TextChannel the ticket channel
+        :param last_id: int the last message id stored before the gap, None for an empty transcript
+        :return: None
+        """
+        after = discord.Object(id=last_id) if last_id else None
+        pages = asyncio.Queue(maxsize=2)
+
+        async def fetch_pages():
+            page = []
+            try:
+                async for message in channel.history(limit=None, after=after, oldest_first=True):
+                    page.extend(transcript_rows(message))
+                    if len(page) >= TRANSCRIPT_PAGE_SIZE:
+                        await pages.put(page)
+                        page = []
+                if page:
+                    await pages.put(page)
+                await pages.put(None)
+            except Exception as e:
+                await pages.put(e)  # Handed to the writer, which raises it
+
+        fetcher = asyncio.create_task(fetch_pages())
+        try:
+            while (page := await pages.get()) is not None:
+                if isinstance(page, Exception):
+                    raise page
+                write_backfill_page(channel.id, page)
+        except BaseException:
+            fetcher.cancel()
+            db.rollback()
+            raise
+        db.commit()  # All the pages in one transaction (a live flush meanwhile commits the complete pages written so far)
+
+    def write_backfill_page(channel_id: int, page: list):
+        """
+        Write one history page with a single executemany, skipping the messages live capture already has
+        :param channel_id: int the ticket channel id
+        :param page: list the transcript rows of the page, oldest first
+        :return: None
+        """
+        captured = {row[1] for row in transcript_buffer if row[0] == channel_id}
+        captured.update(row[0] for row in db.execute("SELECT message_id FROM ticketMessages WHERE channel_id = ? AND message_id BETWEEN ? AND ?", (channel_id, page[0][1], page[-1][1])))
+        db.executemany(TRANSCRIPT_INSERT, [row for row in page if row[1] not in captured])
+
+    async def backfill_open_tickets():
+        for channel_id in list(open_tickets):
+            channel = bot.get_channel(channel_id)
+            if channel is None:  # Deleted while the bot was offline
+                backfill_from.pop(channel_id, None)
+                continue
+            try:
+                await backfill_transcript(channel, backfill_from.pop(channel_id, None))
+            except Exception as e:
+                print(colorama.Fore.RED + f"[-] TicketSystem: Error backfilling the transcript of {channel_id}: {e}")
+
+    async def on_message(message: discord.Message):
+        if message.channel.id not in open_tickets:
+            return
+        transcript_buffer.extend(transcript_rows(message))
+        if len(transcript_buffer) >= TRANSCRIPT_PAGE_SIZE:
+            flush_transcripts()
+        elif flush_task["task"] is None or flush_task["task"].done():
+            flush_task["task"] = asyncio.create_task(delayed_flush())
+
+    # Raw events, so edits and deletions of messages that are no longer in the client message cache are captured too
+    async def on_raw_message_edit(payload: discord.RawMessageUpdateEvent):
+        if payload.channel_id not in open_tickets:
+            return
+        flush_transcripts()
+        db.execute("DELETE FROM ticketMessages WHERE message_id = ?", (payload.message_id,))  # The embed count may have changed, so the rows are replaced
+        db.executemany(TRANSCRIPT_INSERT, transcript_rows(payload.message))
+        db.commit()
+
+    def delete_transcript_messages(message_ids: set):
+        transcript_buffer[:] = [row for row in transcript_buffer if row[1] not in message_ids]
+        db.executemany("DELETE FROM ticketMessages WHERE message_id = ?", [(message_id,) for message_id in message_ids])
+        db.commit()
+
+    async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
+        if payload.channel_id in open_tickets:
+            delete_transcript_messages({payload.message_id})
+
+    async def on_raw_bulk_message_delete(payload: discord.RawBulkMessageDeleteEvent):
+        if payload.channel_id in open_tickets:
+            delete_transcript_messages(payload.message_ids)
+
+    if not hasattr(bot, "on_message_callbacks"):
+        bot.on_message_callbacks = []
+    bot.on_message_callbacks.append(on_message)
+
+    if not hasattr(bot, "on_raw_message_edit_callbacks"):
+        bot.on_raw_message_edit_callbacks = []
+    bot.on_raw_message_edit_callbacks.append(on_raw_message_edit)
+
+    if not hasattr(bot, "on_raw_message_delete_callbacks"):
+        bot.on_raw_message_delete_callbacks = []
+    bot.on_raw_message_delete_callbacks.append(on_raw_message_delete)
+
+    if not hasattr(bot, "on_raw_bulk_message_delete_callbacks"):
+        bot.on_raw_bulk_message_delete_callbacks = []
+    bot.on_raw_bulk_message_delete_callbacks.append(on_raw_bulk_message_delete)
+
     async def request_staff_approval_for_add(interaction: discord.Interaction, member: discord.Member, conf, lang):
-        support_role_ids = conf.get("support_roles", [])
-        support_roles = [interaction.guild.get_role(int(role_id)) for role_id in support_role_ids if interaction.guild.get_role(role_id)]
+        support_roles = [role for role in map(interaction.guild.get_role, support_role_ids["ids"]) if role]
         if not support_roles:
             await interaction.response.send_message(lang["no_support_roles_configured"], ephemeral=True)
             return
@@ -449,7 +747,7 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
 
         @discord.ui.button(label="Approve", style=discord.ButtonStyle.success, custom_id="approve_add_member")
         async def approve_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-            if not is_support_staff(interaction.user, self.config):
+            if not interaction_is_support_staff(interaction):
                 await interaction.response.send_message(self.lang["no_permission_approve"], ephemeral=True)
                 return
             await interaction.channel.set_permissions(self.member_to_add, read_messages=True, send_messages=True)
@@ -458,7 +756,7 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
 
         @discord.ui.button(label="Deny", style=discord.ButtonStyle.danger, custom_id="deny_add_member")
         async def deny_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-            if not is_support_staff(interaction.user, self.config):
+            if not interaction_is_support_staff(interaction):
                 await interaction.response.send_message(self.lang["no_permission_deny"], ephemeral=True)
                 return
             await interaction.response.send_message(self.lang["member_add_denied"].format(member=self.member_to_add.mention))
@@ -467,13 +765,18 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
         async def on_timeout(self):
             await self.requester.send(self.lang["add_member_request_timeout"])
 
-    def is_support_staff(member: discord.Member, conf) -> bool:
-        support_role_ids = conf.get("support_roles", [])
-        for role_id in support_role_ids:
-            role = member.guild.get_role(int(role_id))
-            if role in member.roles:
-                return True
-        return False
+    def is_support_staff(member: discord.Member) -> bool:
+        return not support_role_ids["ids"].isdisjoint(role.id for role in member.roles)
+
+    def interaction_is_support_staff(interaction: discord.Interaction) -> bool:
+        """
+        is_support_staff for the interaction user, computed once per interaction
+        :param interaction: discord.Interaction the interaction
+        :return: bool
+        """
+        if "is_support_staff" not in interaction.extras:
+            interaction.extras["is_support_staff"] = is_support_staff(interaction.user)
+        return interaction.extras["is_support_staff"]
 
     def get_ticket_panel_embed(conf, lang):
         embed = discord.Embed(title=lang["ticket_panel_title"], description=lang["ticket_panel_description"], color=discord.Color.blue())
@@ -499,6 +802,9 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
   ticket_panel_channel_id: {ticket_panel_channel_id}
   ticket_log_channel_id: {ticket_log_channel_id}
   require_staff_approval_for_add_user: {str(require_staff_approval_for_add_user).lower()}
+  ticket_creation_rate: 1 # Ticket channels created per second when many users open tickets at once
+  ticket_creation_burst: 5 # Ticket channels that can be created at once before the rate applies
+  warm_pool_size: 0 # Hidden channels kept ready in each ticket category so tickets open with a single edit, 0 to disable
   # After sending the placeholder message below, please copy its ID into ticket_panel_message_id:
   # ticket_panel_message_id: <PUT_MESSAGE_ID_HERE>
 """
@@ -820,7 +1126,7 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
                 return
 
             # Check if user can close
-            if not await can_close_ticket(interaction.user, channel, config):
+            if not await can_close_ticket(interaction):
                 await interaction.response.send_message(lang["no_permission_close"], ephemeral=True)
                 return
 
@@ -828,28 +1134,41 @@ def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: di
             await close_ticket(channel, interaction.user, config, lang)
 
         if custom_id == "ticket_claim_button":
-            if not is_support_staff(interaction.user, config): # Check if the user is support staff
+            if not interaction_is_support_staff(interaction): # Check if the user is support staff
                 await interaction.response.send_message(lang["no_permission_claim"], ephemeral=True)
                 return
 
             # Even though the button is disabled I will check if the ticket is already claimed
-            row = db.execute("SELECT claimed_by FROM ticketsTicketSystem WHERE channel_id = ?", (interaction.channel.id,)).fetchone()
-            if row and row[0] is not None:
+            ticket = open_tickets.get(interaction.channel.id)
+            if ticket is None:
+                await interaction.response.send_message(lang["not_in_ticket_channel"], ephemeral=True)
+                return
+            if ticket["claimed_by"] is not None:
                 await interaction.response.send_message(lang["ticket_already_claimed"], ephemeral=True)
                 return
+            ticket["claimed_by"] = interaction.user.id
 
             db.execute(
                 "UPDATE ticketsTicketSystem SET claimed_by = ?, claim_time = datetime('now') WHERE channel_id = ?", # Update the DB with claim information
                 (interaction.user.id, interaction.channel.id)
             )
+            db.execute(
+                "INSERT INTO ticketClaimsDaily (user_id, day, count) VALUES (?, date('now'), 1) ON CONFLICT(user_id, day) DO UPDATE SET count = count + 1",
+                (interaction.user.id,)
+            )
+            db.execute(
+                "INSERT INTO ticketClaimsTotal (user_id, count) VALUES (?, 1) ON CONFLICT(user_id) DO UPDATE SET count = count + 1",
+                (interaction.user.id,)
+            )
+            claims_version["version"] += 1
             db.commit()
 
             # Update channel permissions:
             current_overwrites = interaction.channel.overwrites or {}
             new_overwrites = current_overwrites.copy()
 
-            for role_id in config.get("support_roles", []):
-                role = interaction.guild.get_role(int(role_id))
+            for role_id in support_role_ids["ids"]:
+                role = interaction.guild.get_role(role_id)
                 if role:
                     new_overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=False) # Update each support role: allow read_messages but disable send_messages.
             new_overwrites[interaction.user] = discord.PermissionOverwrite(read_messages=True, send_messages=True) # Ensure that the claiming staff member can send messages
@@ -0,0 +1,83 @@
+import asyncio
+import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import discord
+from PIL import Image, ImageDraw, ImageFont
+
+
+class WelcomeCardRenderer:
+    """
+    Draws welcome card images (background, round member avatar and two lines of text).
+    The background, font and avatar mask are decoded once and kept in memory, decoded avatars are kept
+    in an LRU cache keyed by avatar hash, and all Pillow work runs in a thread pool so the event loop never blocks.
+    """
+    def __init__(self, background_path: str, font_path: str, font_size: int = 40, avatar_size: int = 180, workers: int = 2, avatar_cache_size: int = 256):
+        background = Image.open(background_path).convert("RGBA")
+        if background.getchannel("A").getextrema()[0] == 255:
+            # Opaque backgrounds are sent as JPEG: about 3 ms to encode against 25-30 ms for PNG, which would miss 50 ms p95
+            self.background = background.convert("RGB")
+            self.filename = "welcome.jpg"
+        else:  # Transparency needs PNG
+            self.background = background
+            self.filename = "welcome.png"
+        self.font = ImageFont.truetype(font_path, font_size)
+        self.small_font = ImageFont.truetype(font_path, max(1, int(font_size * 0.6)))
+        self.font_size = font_size
+        self.avatar_size = avatar_size
+        self.mask = Image.new("L", (avatar_size, avatar_size), 0)
+        ImageDraw.Draw(self.mask).ellipse((0, 0, avatar_size - 1, avatar_size - 1), fill=255)
+        self.avatar_cache_size = avatar_cache_size
+        self.avatars = OrderedDict()  # avatar key -> resized RGBA avatar, least recently used first
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="welcome-card")
+
+    def decode_avatar(self, data: bytes) -> Image.Image:
+        avatar = Image.open(io.BytesIO(data)).convert("RGBA").resize((self.avatar_size, self.avatar_size), Image.LANCZOS)
+        avatar.load()
+        return avatar
+
+    async def get_avatar(self, member: discord.Member) -> Image.Image:
+        """
+        Get the decoded avatar of a member, downloading it only when its hash is not cached
+        :param member: discord.Member the member
+        :return: Image.Image the avatar resized to avatar_size
+        """
+        asset = member.display_avatar
+        avatar = self.avatars.get(asset.key)
+        if avatar is not None:
+            self.avatars.move_to_end(asset.key)
+            return avatar
+        data = await asset.replace(size=256, format="png").read()
+        avatar = await asyncio.get_running_loop().run_in_executor(self.executor, self.decode_avatar, data)
+        self.avatars[asset.key] = avatar
+        if len(self.avatars) > self.avatar_cache_size:
+            self.avatars.popitem(last=False)
+        return avatar
+
+    def draw(self, avatar: Image.Image, title: str, subtitle: str) -> bytes:
+        card = self.background.copy()
+        x = (card.width - self.avatar_size) // 2
+        y = max(0, (card.height - self.avatar_size - self.font_size * 2) // 2)
+        card.paste(avatar, (x, y), self.mask)
+        draw = ImageDraw.Draw(card)
+        text_y = y + self.avatar_size + self.font_size // 3
+        draw.text((card.width // 2, text_y), title, font=self.font, fill="white", anchor="mt", stroke_width=2, stroke_fill="black")
+        draw.text((card.width // 2, text_y + self.font_size + 4), subtitle, font=self.small_font, fill="white", anchor="mt", stroke_width=2, stroke_fill="black")
+        stream = io.BytesIO()
+        if self.background.mode == "RGB":
+            card.save(stream, format="JPEG", quality=90)
+        else:
+            card.save(stream, format="PNG", compress_level=1)  # Low compression, the card is sent once and size matters less than latency
+        return stream.getvalue()
+
+    async def render(self, member: discord.Member, title: str, subtitle: str) -> discord.File:
+        """
+        Render the welcome card of a member
+        :param member: discord.Member the member that joined
+        :param title: str the first line of text
+        :param subtitle: str the second line of text
+        :return: discord.File the card, named welcome.jpg or welcome.png (see filename)
+        """
+        avatar = await self.get_avatar(member)
+        data = await asyncio.get_running_loop().run_in_executor(self.executor, self.draw, avatar, title, subtitle)
+        return discord.File(io.BytesIO(data), filename=self.filename)
@@ -1,26 +1,270 @@
+import asyncio
+import time
+from collections import deque
 from datetime import datetime
+import colorama
 import discord
 import utils
 
 
+class WelcomeTemplate:
+    """
+    The welcome embed compiled once at init.
+    Fields without placeholders are kept as they are, the others are joined into one string
+    so a join costs a single utils.replace_variables call.
+    """
+    SEPARATOR = "\x00"
+
+    def __init__(self, fields: dict, color: discord.Color, timestamp: bool):
+        self.static = {key: value for key, value in fields.items() if not value or "{{" not in value}
+        self.dynamic_keys = [key for key, value in fields.items() if value and "{{" in value]
+        self.dynamic_text = self.SEPARATOR.join(fields[key] for key in self.dynamic_keys)
+        self.color = color
+        self.timestamp = timestamp
+
+    def render(self, member: discord.Member, inviter: str = "") -> discord.Embed:
+        """
+        Build the welcome embed for a member
+        :param member: discord.Member the member that joined
+        :param inviter: str the value of the {{inviter}} placeholder
+        :return: discord.Embed the welcome embed
+        """
+        values = dict(self.static)
+        if self.dynamic_keys:
+            values.update(zip(self.dynamic_keys, utils.replace_variables(self.dynamic_text.replace("{{inviter}}", inviter), member, member.guild).split(self.SEPARATOR)))
+        em = discord.Embed(title=values["title"], url=values["url"], description=values["description"], color=self.color)
+        em.set_author(name=values["author_name"], url=values["author_url"], icon_url=values["author_icon_url"])
+        em.set_thumbnail(url=values["thumbnail_url"])
+        em.set_image(url=values["image_url"])
+        em.set_footer(text=values["footer_text"], icon_url=values["footer_icon_url"])
+        if self.timestamp:
+            em.timestamp = datetime.now()
+        return em
+
+
+def group_embeds(embeds: list) -> list:
+    """
+    Split embeds into groups that fit in one message: at most 10 embeds and 6000 characters in total
+    :param embeds: list[discord.Embed] the embeds, in order
+    :return: list[list[discord.Embed]] the groups, in order
+    """
+    groups = []
+    size = 0
+    for embed in embeds:
+        length = len(embed)
+        if not groups or len(groups[-1]) == 10 or size + length > 6000:
+            groups.append([])
+            size = 0
+        groups[-1].append(embed)
+        size += length
+    return groups
+
+
 def init(tree: discord.app_commands.CommandTree, bot: discord.Client, config: dict, lang: dict):
+    template = WelcomeTemplate({
+        "title": lang["title"]["text"],
+        "url": config["embed"]["title"]["url"],
+        "description": lang["description"],
+        "author_name": lang["author"]["name"],
+        "author_url": config["embed"]["author"]["url"],
+        "author_icon_url": config["embed"]["author"]["icon_url"],
+        "thumbnail_url": config["embed"]["thumbnail_url"],
+        "image_url": config["embed"]["image_url"],
+        "footer_text": lang["footer"]["text"],
+        "footer_icon_url": config["embed"]["footer"]["icon_url"],
+    }, discord.Color.from_str(config["embed"]["color"]), config["embed"]["footer"]["timestamp"])
+    channel_id = int(config["channel-id"])
+
+    card_config = config.get("card", {}) or {}
+    card_renderer = None
+    if card_config.get("enabled", False):
+        try:
+            from Commands.Welcome.card import WelcomeCardRenderer  # Pillow is only needed when cards are enabled
+            card_renderer = WelcomeCardRenderer(card_config["background"], card_config["font"], int(card_config.get("font_size", 40)), int(card_config.get("avatar_size", 180)), int(card_config.get("workers", 2)), int(card_config.get("avatar_cache_size", 256)))
+        except ImportError as e:
+            print(colorama.Fore.RED + f"[-] Welcome: Pillow is not installed, welcome cards are disabled: {e}")
+        except (OSError, KeyError) as e:
+            print(colorama.Fore.RED + f"[-] Welcome: could not load the welcome card assets, cards are disabled: {e}")
+
+    invite_config = config.get("invite_tracking", {}) or {}
+    invite_tracking = invite_config.get("enabled", False)
+    invite_refresh_delay = float(invite_config.get("refresh_delay", 1.5))
+    invites = {}  # invite code -> [uses, max_uses, inviter mention] of the welcome guild
+    deleted_invites = set()  # codes deleted since the last refresh, kept until then to attribute their last use
+    invite_refresh = {"task": None, "members": [], "loaded": False}  # the refresh shared by the joins of the current burst
+
+    async def load_invites(guild: discord.Guild):
+        try:
+            fetched = await guild.invites()
+        except discord.HTTPException as e:
+            print(colorama.Fore.YELLOW + f"[!] Welcome: could not fetch the server invites (Manage Server permission is needed for invite tracking): {e}")
+            return None
+        return {invite.code: [invite.uses or 0, invite.max_uses or 0, invite.inviter.mention if invite.inviter else None] for invite in fetched}
+
+    async def refresh_invites(guild: discord.Guild):
+        """
+        Refresh the invite snapshot once for all the joins of a burst and find who invited them.
+        The API lists invites in its own order, not in join order, so an inviter is only named when every new use
+        belongs to the same inviter and there is one use per join. Uses that can't be seen (an invite deleted on its
+        last use without on_invite_delete reaching us) leave the counts unequal, so everyone gets unknown_inviter.
+        :param guild: discord.Guild the welcome guild
+        :return: str the inviter mention of all the joins of this refresh, None when it isn't certain
+        """
+        await asyncio.sleep(invite_refresh_delay)  # Let the other joins of the burst share this refresh
+        try:
+            fetched = await load_invites(guild)
+        finally:
+            joins = len(invite_refresh["members"])  # Joins during the fetch are part of this refresh
+            invite_refresh["task"] = None  # Joins from now on wait for the next refresh
+        if fetched is None:
+            return None
+        if not invite_refresh["loaded"]:  # No snapshot to compare with yet
+            invite_refresh["loaded"] = True
+            invites.update(fetched)
+            return None
+        used = []
+        for code, (uses, max_uses, inviter) in fetched.items():
+            previous_uses = invites[code][0] if code in invites else 0  # Invites created without on_invite_create count from 0
+            used.extend([inviter] * max(0, uses - previous_uses))
+        for code in deleted_invites:  # Invites deleted on their last use (max uses reached)
+            if code in invites and code not in fetched and invites[code][1] and invites[code][0] + 1 == invites[code][1]:
+                used.append(invites[code][2])
+        deleted_invites.clear()
+        invites.clear()
+        invites.update(fetched)
+        if len(used) == joins and len(set(used)) == 1:
+            return used[0]
+        return None
+
+    def track_join(member: discord.Member):
+        """
+        Register a join in the current invite refresh, starting one if needed
+        :param member: discord.Member the member that joined
+        :return: the refresh task
+        """
+        if invite_refresh["task"] is None:
+            invite_refresh["members"] = []
+            invite_refresh["task"] = asyncio.create_task(refresh_invites(member.guild))
+        invite_refresh["members"].append(member.id)
+        return invite_refresh["task"]
+
+    async def get_inviter(member: discord.Member) -> str:
+        inviter = await track_join(member)
+        return inviter if inviter is not None else lang["unknown_inviter"]
+
+    async def on_ready():
+        if not invite_tracking:
+            return
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            return
+        fetched = await load_invites(channel.guild)
+        if fetched is not None:
+            invites.clear()
+            invites.update(fetched)
+            invite_refresh["loaded"] = True
+
+    async def on_invite_create(invite: discord.Invite):
+        if invite_tracking and invite.guild is not None and getattr(bot.get_channel(channel_id), "guild", None) == invite.guild:
+            invites[invite.code] = [invite.uses or 0, invite.max_uses or 0, invite.inviter.mention if invite.inviter else None]
+
+    async def on_invite_delete(invite: discord.Invite):
+        if invite_tracking and invite.code in invites:
+            deleted_invites.add(invite.code)
+
+    burst_config = config.get("burst", {}) or {}
+    burst_enabled = burst_config.get("enabled", False)
+    burst_threshold = int(burst_config.get("threshold", 10))
+    burst_window = float(burst_config.get("window", 60))
+    batch_size = max(1, min(int(burst_config.get("batch_size", 20)), 100))  # 100 mentions stay well under the 4096 characters of a description
+    flush_interval = float(burst_config.get("flush_interval", 10))
+    join_times = deque()  # monotonic times of the joins in the last burst_window seconds
+    pending_members = []  # members waiting for the next batched welcome, oldest first
+    flush_task = {"task": None}
+
+    def render_batch(members: list) -> discord.Embed:
+        """
+        Build one batched welcome embed listing several members
+        :param members: list[discord.Member] the members to welcome, oldest first
+        :return: discord.Embed the batched welcome embed
+        """
+        guild = members[0].guild
+        mentions = ", ".join(member.mention for member in members)
+        em = discord.Embed(title=utils.replace_variables(lang["batch"]["title"].replace("{{count}}", str(len(members))), None, guild),
+                           description=utils.replace_variables(lang["batch"]["description"].replace("{{members}}", mentions).replace("{{count}}", str(len(members))), None, guild),
+                           color=template.color)
+        em.set_footer(text=utils.replace_variables(lang["batch"]["footer"]["text"], None, guild))
+        if template.timestamp:
+            em.timestamp = datetime.now()
+        return em
+
+    async def flush_batches(channel: discord.TextChannel):
+        """
+        Send the batched welcomes every flush_interval seconds until no member is waiting
+        :param channel: discord.TextChannel the welcome channel
+        """
+        while pending_members:
+            await asyncio.sleep(flush_interval)
+            members = pending_members[:batch_size * 10]
+            del pending_members[:batch_size * 10]
+            embeds = [render_batch(members[i:i + batch_size]) for i in range(0, len(members), batch_size)]
+            for group in group_embeds(embeds):
+                try:
+                    await channel.send(embeds=group)
+                except discord.HTTPException as e:
+                    print(colorama.Fore.RED + f"[-] Welcome: could not send batched welcome: {e}")
+
+    def in_burst() -> bool:
+        """
+        Record a join and check if the join rate is above the burst threshold
+        :return: bool True if the member should be welcomed in a batch
+        """
+        now = time.monotonic()
+        join_times.append(now)
+        while join_times and join_times[0] <= now - burst_window:
+            join_times.popleft()
+        return len(join_times) > burst_threshold or bool(pending_members)  # Keep the order while a batch is still waiting
 
     async def on_member_join(member: discord.Member):
         """
         This function is called when a member joins the server
         :param member: discord.Member the member that joined
         """
-        channel = bot.get_channel(int(config["channel-id"]))
-        if channel is not None:
-            em = discord.Embed(title=utils.replace_variables(lang["title"]["text"], member, member.guild), url=utils.replace_variables(config["embed"]["title"]["url"], member, member.guild), description=utils.replace_variables(lang["description"], member, member.guild), color=discord.Color.from_str(config["embed"]["color"]))
-            em.set_author(name=utils.replace_variables(lang["author"]["name"], member, member.guild), url=utils.replace_variables(config["embed"]["author"]["url"], member, member.guild), icon_url=utils.replace_variables(config["embed"]["author"]["icon_url"], member, member.guild))
-            em.set_thumbnail(url=utils.replace_variables(config["embed"]["thumbnail_url"], member, member.guild))
-            em.set_image(url=utils.replace_variables(config["embed"]["image_url"], member, member.guild))
-            em.set_footer(text=utils.replace_variables(lang["footer"]["text"], member, member.guild), icon_url=utils.replace_variables(config["embed"]["footer"]["icon_url"], member, member.guild))
-            if config["embed"]["footer"]["timestamp"]:
-                em.timestamp = datetime.now()
-            await channel.send(embed=em)
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            return
+        track_invites = invite_tracking and member.guild == channel.guild  # The snapshot holds the welcome guild's invites only
+        if burst_enabled and in_burst():
+            if track_invites:
+                track_join(member)  # Keeps the invite snapshot in step, batched welcomes don't show the inviter
+            pending_members.append(member)
+            if flush_task["task"] is None or flush_task["task"].done():
+                flush_task["task"] = asyncio.create_task(flush_batches(channel))
+            return
+        em = template.render(member, await get_inviter(member) if track_invites else lang["unknown_inviter"])
+        if card_renderer is not None:
+            try:
+                file = await card_renderer.render(member, utils.replace_variables(lang["card"]["title"].replace("{{member_name}}", member.display_name), member, member.guild),
+                                                  utils.replace_variables(lang["card"]["subtitle"].replace("{{member_name}}", member.display_name), member, member.guild))
+            except Exception as e:
+                print(colorama.Fore.RED + f"[-] Welcome: could not render the welcome card: {e}")
+            else:
+                em.set_image(url=f"attachment://{file.filename}")
+                return await channel.send(embed=em, file=file)
+        await channel.send(embed=em)
 
     if not hasattr(bot, "on_member_join_callbacks"):
         bot.on_member_join_callbacks = []
-    bot.on_member_join_callbacks.append(on_member_join)
\ No newline at end of file
+    bot.on_member_join_callbacks.append(on_member_join)
+
+    if not hasattr(bot, "on_ready_callbacks"):
+        bot.on_ready_callbacks = []
+    bot.on_ready_callbacks.append(on_ready)
+
+    if not hasattr(bot, "on_invite_create_callbacks"):
+        bot.on_invite_create_callbacks = []
+    bot.on_invite_create_callbacks.append(on_invite_create)
+
+    if not hasattr(bot, "on_invite_delete_callbacks"):
+        bot.on_invite_delete_callbacks = []
+    bot.on_invite_delete_callbacks.append(on_invite_delete)
\ No newline at end of file
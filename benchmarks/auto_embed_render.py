@@ -0,0 +1,57 @@
+"""
+AutoEmbeds: per-message render cost of the original inline embed building against AutoEmbedTemplate.render.
+"""
+import datetime
+import sqlite3
+import discord
+import common
+
+ITERATIONS = 20000
+
+auto_embed = common.load_command("AutoEmbeds/Commands/AutoEmbeds/auto embed.py")
+
+
+class Message:
+    def __init__(self, message_id: int, guild: common.Guild):
+        self.id = message_id
+        self.content = f"message number {message_id} with some text in it"
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.guild = guild
+        self.author = common.Member(message_id % 50, guild)
+
+
+def render_before(row: tuple, message: Message) -> discord.Embed:
+    # on_message body before the templates, without the per-message database read
+    message_content = message.content
+    embed = discord.Embed(title=row[1], timestamp=message.created_at)
+    if row[2] is not None:
+        embed.description = row[2] + "\n" + f"```{message_content}```"
+    embed.description = message.content
+    if row[3] is not None:
+        embed.description = f"```{message_content}```" + "\n" + row[3]
+    if row[2] is not None and row[3] is not None:
+        embed.description = row[2] + "\n" + f"```{message_content}```" + "\n" + row[3]
+    if row[2] is None and row[3] is None:
+        embed.description = f"```{message_content}```"
+    embed.set_author(name=message.author.name, icon_url=message.author.avatar.url)
+    embed.set_thumbnail(url=message.guild.icon.url)
+    embed.set_footer(text=message.guild.name, icon_url=message.guild.icon.url)
+    return embed
+
+
+def main():
+    guild = common.Guild()
+    row = (1, "Announcements", "New post:", "React below!")
+    messages = [Message(i, guild) for i in range(ITERATIONS)]
+    template = auto_embed.AutoEmbedTemplate(row[1], row[2], row[3], guild)
+    assert render_before(row, messages[0]).description == template.render(messages[0]).description
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE autoEmbeds (channel_id INTEGER PRIMARY KEY NOT NULL, embed_title TEXT NOT NULL, embed_description_before_message TEXT DEFAULT NULL, embed_description_after_message TEXT DEFAULT NULL)")
+    db.execute("INSERT INTO autoEmbeds VALUES (?, ?, ?, ?)", row)
+    common.report("inline build (before)", common.measure(lambda i: render_before(row, messages[i]), ITERATIONS))
+    common.report("row read + inline build (before)", common.measure(lambda i: render_before(db.execute("SELECT * FROM autoEmbeds WHERE channel_id=?", (1,)).fetchone(), messages[i]), ITERATIONS))
+    common.report("AutoEmbedTemplate.render (after)", common.measure(lambda i: template.render(messages[i]), ITERATIONS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Shared helpers for the benchmarks: load a package command file without a running bot, stand-in Discord objects
+and a small timing function. Run any benchmark from the repository root, e.g. `python benchmarks/auto_embed_render.py`.
+"""
+import importlib.util
+import json
+import pathlib
+import re
+import statistics
+import sys
+import time
+import types
+import yaml
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+PLACEHOLDER = re.compile(r"{{([A-Za-z_.]+)}}")
+
+
+def replace_variables(text: str, member=None, guild=None) -> str:
+    """
+    Stand-in for the EbBot core utils.replace_variables: one regex pass over the {{...}} placeholders the package
+    langs and configs use ({{user}}, {{user.name}}, {{user.icon}}, {{server.name}}, {{server.icon}}, {{server.memberCount}})
+    """
+    if not text:
+        return text
+    values = {}
+    if member is not None:
+        values.update({"user": member.mention, "user.name": member.name, "user.icon": member.display_avatar.url, "user.id": str(member.id)})
+    if guild is not None:
+        values.update({"server.name": guild.name, "server.icon": guild.icon.url, "server.memberCount": str(guild.member_count), "server.id": str(guild.id)})
+    return PLACEHOLDER.sub(lambda match: values.get(match.group(1), match.group(0)), text)
+
+
+def load_command(relative_path: str) -> types.ModuleType:
+    """
+    Import a command file by path (package folders contain spaces), with a stand-in for the EbBot core `utils` module
+    :param relative_path: str path from the repository root
+    :return: the loaded module
+    """
+    if "utils" not in sys.modules:
+        sys.modules["utils"] = types.SimpleNamespace(replace_variables=replace_variables)
+    path = ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(path.stem.replace(" ", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Tree:
+    def __init__(self):
+        self.commands = []
+
+    def add_command(self, command):
+        self.commands.append(command)
+
+
+def load_lang(package: str, config_key: str, language: str = "en") -> dict:
+    return json.loads((ROOT / package / "Commands" / package / "lang" / f"{language}.json").read_text(encoding="utf-8"))[config_key]
+
+
+def init_command(package: str, command_file: str, config_key: str, db=None, config: dict = None, language: str = "en", **bot_attributes) -> types.SimpleNamespace:
+    """
+    Load a command file and run its init the way EbBot does, with the package's shipped config and lang
+    :param package: str the package folder, e.g. "Embed Manager"
+    :param command_file: str the command file name, e.g. "embed manager.py"
+    :param config_key: str the top-level key of the package config
+    :param db: the sqlite3 connection passed to init, None for packages that take no database
+    :param config: dict overrides merged into the shipped config
+    :param bot_attributes: extra attributes of the stand-in bot, e.g. get_channel
+    :return: the stand-in bot, holding the registered callbacks
+    """
+    module = load_command(f"{package}/Commands/{package}/{command_file}")
+    config_path = ROOT / package / "Configs" / f"{package}.yml"
+    package_config = yaml.safe_load(config_path.read_text(encoding="utf-8"))[config_key] if config_path.exists() else {}
+    package_config.update(config or {})
+    lang = load_lang(package, config_key, language)
+    bot = types.SimpleNamespace(user=types.SimpleNamespace(id=0), add_view=lambda *args, **kwargs: None, **bot_attributes)
+    args = (Tree(), bot, package_config, lang) + ((db,) if db is not None else ())
+    module.init(*args)
+    bot.module = module
+    return bot
+
+
+class Asset:
+    def __init__(self, url: str, key: str = "asset"):
+        self.url = url
+        self.key = key
+
+
+class Guild:
+    def __init__(self, guild_id: int = 1, name: str = "Benchmark Guild", roles: list = None):
+        self.id = guild_id
+        self.name = name
+        self.icon = Asset("https://cdn.discordapp.com/icons/1/icon.png")
+        self.member_count = 1000
+        self.roles = roles or []
+        self._roles = {role.id: role for role in self.roles}
+
+    def get_role(self, role_id: int):
+        return self._roles.get(role_id)
+
+
+class Member:
+    def __init__(self, member_id: int, guild: Guild = None, name: str = None):
+        self.id = member_id
+        self.name = name or f"user{member_id}"
+        self.display_name = self.name
+        self.mention = f"<@{member_id}>"
+        self.guild = guild
+        self.avatar = Asset(f"https://cdn.discordapp.com/avatars/{member_id}/a.png", key=f"a{member_id}")
+        self.display_avatar = self.avatar
+        self.bot = False
+        self.roles = []
+
+
+def measure(function, iterations: int) -> list[float]:
+    """
+    Call function iterations times
+    :return: list[float] the duration of every call in seconds
+    """
+    durations = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        function(i)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+async def measure_async(coroutine_function, arguments: list) -> list[float]:
+    """
+    Await coroutine_function once per argument, in one event loop
+    :return: list[float] the duration of every call in seconds
+    """
+    durations = []
+    for argument in arguments:
+        start = time.perf_counter()
+        await coroutine_function(argument)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+class Channel:
+    def __init__(self, channel_id: int = 1, guild: Guild = None):
+        self.id = channel_id
+        self.guild = guild
+        self.sent = 0
+        self.last = None  # kwargs of the last send
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+        self.last = kwargs
+
+
+def report(name: str, durations: list[float]):
+    durations = sorted(durations)
+    p95 = durations[int(len(durations) * 0.95) - 1]
+    print(f"{name:<40} {len(durations):>7} calls  mean {statistics.fmean(durations) * 1e6:9.2f} us  p95 {p95 * 1e6:9.2f} us  total {sum(durations) * 1e3:9.1f} ms")
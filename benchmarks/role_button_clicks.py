@@ -0,0 +1,85 @@
+"""
+Embed Manager: role button clicks against a guild with 250 roles, the original startswith + discord.utils.get
+dispatch against the prefix table and guild.get_role used by on_interaction now.
+"""
+import asyncio
+import random
+import sqlite3
+import discord
+import common
+
+ROLES = 250
+CLICKS = 5000
+
+
+class Role:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.mention = f"<@&{role_id}>"
+
+    def is_default(self) -> bool:
+        return False
+
+
+class Response:
+    async def send_message(self, *args, **kwargs):
+        pass
+
+
+class ClickingMember(common.Member):
+    async def add_roles(self, *roles):
+        pass
+
+    async def remove_roles(self, *roles):
+        pass
+
+
+class Interaction:
+    def __init__(self, guild: common.Guild, user: ClickingMember, custom_id: str):
+        self.type = discord.InteractionType.component
+        self.data = {"component_type": 2, "custom_id": custom_id}
+        self.message = None  # Not a registered panel, so on_interaction handles the click itself
+        self.guild = guild
+        self.user = user
+        self.response = Response()
+
+
+def before(lang: dict):
+    # on_interaction of the baseline, the role replies trimmed to the dispatch and role lookup
+    async def on_interaction(interaction):
+        if interaction.type == discord.InteractionType.component:
+            if interaction.data["component_type"] == 2:
+                if "custom_id" in interaction.data and interaction.data["custom_id"].startswith("button_role_"):
+                    role = discord.utils.get(interaction.guild.roles, id=int(interaction.data["custom_id"].replace("button_role_", "")))
+                    if role in interaction.user.roles:
+                        return await interaction.response.send_message(lang["role_already_added"].replace("{{role}}", role.mention), ephemeral=True)
+                    await interaction.user.add_roles(role)
+                    await interaction.response.send_message(lang["role_added"].replace("{{role}}", role.mention), ephemeral=True)
+                elif "custom_id" in interaction.data and interaction.data["custom_id"].startswith("toggle_button_role_"):
+                    role = discord.utils.get(interaction.guild.roles, id=int(interaction.data["custom_id"].replace("toggle_button_role_", "")))
+                    if role in interaction.user.roles:
+                        await interaction.user.remove_roles(role)
+                        return await interaction.response.send_message(lang["role_removed"].replace("{{role}}", role.mention), ephemeral=True)
+                    await interaction.user.add_roles(role)
+                    await interaction.response.send_message(lang["role_added"].replace("{{role}}", role.mention), ephemeral=True)
+    return on_interaction
+
+
+def main():
+    bot = common.init_command("Embed Manager", "embed manager.py", "embed manager", db=sqlite3.connect(":memory:"))
+    roles = [Role(100000000000000000 + i) for i in range(ROLES)]
+    guild = common.Guild(roles=roles)
+    randomizer = random.Random(0)
+    interactions = []
+    for i in range(CLICKS):
+        user = ClickingMember(i, guild)
+        user.roles = randomizer.sample(roles, 10)
+        prefix = randomizer.choice(("button_role_", "toggle_button_role_"))
+        interactions.append(Interaction(guild, user, prefix + str(randomizer.choice(roles).id)))
+    lang = common.load_lang("Embed Manager", "embed manager")
+    common.report("startswith + utils.get (before)", asyncio.run(common.measure_async(before(lang), interactions)))
+    common.report("prefix table + get_role (after)", asyncio.run(common.measure_async(bot.on_interaction_callbacks[0], interactions)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Welcome: welcome card latency at 20 joins per second with one render thread, against the 50 ms p95 target.
+Every join is a new member, so every card also decodes an avatar (cache miss). The default background is a
+1024x450 Mandelbrot render, detailed enough that PNG encoding costs about as much as for a photo.
+Usage: python benchmarks/welcome_card_render.py [font.ttf] [background.png]
+(the font defaults to the DejaVu Sans shipped with matplotlib)
+"""
+import asyncio
+import importlib.util
+import io
+import pathlib
+import sys
+import tempfile
+import time
+from PIL import Image
+import common
+
+JOINS_PER_SECOND = 20
+DURATION = 10  # seconds
+TARGET_P95 = 0.050
+
+card = common.load_command("Welcome/Commands/Welcome/card.py")
+
+
+class AvatarAsset(common.Asset):
+    def __init__(self, member_id: int, data: bytes):
+        super().__init__(f"https://cdn.discordapp.com/avatars/{member_id}/a.png", key=f"a{member_id}")
+        self.data = data
+
+    def replace(self, **kwargs):
+        return self
+
+    async def read(self) -> bytes:
+        return self.data  # Download time is not part of the render cost
+
+
+def default_font() -> str:
+    spec = importlib.util.find_spec("matplotlib")
+    if spec is None:
+        sys.exit("No font given and matplotlib (for its DejaVu Sans) is not installed: pass a .ttf path")
+    return str(pathlib.Path(spec.origin).parent / "mpl-data" / "fonts" / "ttf" / "DejaVuSans.ttf")
+
+
+def png(image: Image.Image) -> bytes:
+    stream = io.BytesIO()
+    image.save(stream, format="PNG")
+    return stream.getvalue()
+
+
+async def replay(renderer, members: list) -> list[float]:
+    latencies = []
+
+    async def join(member, due: float):
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await renderer.render(member, f"Welcome {member.name}!", "You are member #1000")
+        latencies.append(time.perf_counter() - due)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(join(member, start + i / JOINS_PER_SECOND) for i, member in enumerate(members)))
+    return latencies
+
+
+def main():
+    font = sys.argv[1] if len(sys.argv) > 1 else default_font()
+    with tempfile.TemporaryDirectory() as directory:
+        background = pathlib.Path(sys.argv[2]) if len(sys.argv) > 2 else pathlib.Path(directory) / "background.png"
+        if len(sys.argv) <= 2:
+            Image.effect_mandelbrot((1024, 450), (-2.0, -1.0, 1.0, 1.0), 60).convert("RGB").save(background)
+        renderer = card.WelcomeCardRenderer(str(background), font, workers=1)
+        avatar = png(Image.radial_gradient("L").convert("RGB").resize((256, 256)))
+        members = []
+        for i in range(JOINS_PER_SECOND * DURATION):
+            member = common.Member(10 ** 17 + i)
+            member.display_avatar = AvatarAsset(member.id, avatar)
+            members.append(member)
+        renderer.draw(renderer.decode_avatar(avatar), "warm up", "glyph cache")
+        common.report("card back to back, 1 thread", asyncio.run(common.measure_async(lambda member: renderer.render(member, f"Welcome {member.name}!", "You are member #1000"), members[:50])))
+        renderer.avatars.clear()
+        latencies = asyncio.run(replay(renderer, members))
+    common.report(f"card at {JOINS_PER_SECOND} joins/s, 1 thread", latencies)
+    p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+    print(f"p95 {p95 * 1e3:.1f} ms, target {TARGET_P95 * 1e3:.0f} ms: {'met' if p95 <= TARGET_P95 else 'missed'}")
+
+
+if __name__ == "__main__":
+    main()
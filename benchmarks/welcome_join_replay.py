@@ -0,0 +1,49 @@
+"""
+Welcome: replay 10k synthetic joins through the original on_member_join (nine replace_variables calls and a color
+parse per join) and through the compiled WelcomeTemplate path registered by init.
+"""
+import asyncio
+import json
+from datetime import datetime
+import discord
+import common
+
+JOINS = 10000
+
+
+def before(config: dict, lang: dict, channel: common.Channel):
+    # on_member_join of the baseline
+    utils = common  # common.replace_variables is the stand-in the loaded package uses as utils.replace_variables
+
+    async def on_member_join(member):
+        em = discord.Embed(title=utils.replace_variables(lang["title"]["text"], member, member.guild), url=utils.replace_variables(config["embed"]["title"]["url"], member, member.guild), description=utils.replace_variables(lang["description"], member, member.guild), color=discord.Color.from_str(config["embed"]["color"]))
+        em.set_author(name=utils.replace_variables(lang["author"]["name"], member, member.guild), url=utils.replace_variables(config["embed"]["author"]["url"], member, member.guild), icon_url=utils.replace_variables(config["embed"]["author"]["icon_url"], member, member.guild))
+        em.set_thumbnail(url=utils.replace_variables(config["embed"]["thumbnail_url"], member, member.guild))
+        em.set_image(url=utils.replace_variables(config["embed"]["image_url"], member, member.guild))
+        em.set_footer(text=utils.replace_variables(lang["footer"]["text"], member, member.guild), icon_url=utils.replace_variables(config["embed"]["footer"]["icon_url"], member, member.guild))
+        if config["embed"]["footer"]["timestamp"]:
+            em.timestamp = datetime.now()
+        await channel.send(embed=em)
+    return on_member_join
+
+
+def main():
+    guild = common.Guild()
+    channel = common.Channel(guild=guild)
+    overrides = {"burst": {"enabled": False}, "card": {"enabled": False}, "invite_tracking": {"enabled": False}}  # One welcome per join
+    bot = common.init_command("Welcome", "welcome.py", "welcome", config=overrides, get_channel=lambda channel_id: channel)
+    members = [common.Member(1000 + i, guild) for i in range(JOINS)]
+    config = common.yaml.safe_load((common.ROOT / "Welcome/Configs/Welcome.yml").read_text(encoding="utf-8"))["welcome"]
+    lang = common.load_lang("Welcome", "welcome")
+    common.report("9x replace_variables (before)", asyncio.run(common.measure_async(before(config, lang, channel), members)))
+    before_embed = channel.last["embed"].to_dict()
+    common.report("WelcomeTemplate (after)", asyncio.run(common.measure_async(bot.on_member_join_callbacks[0], members)))
+    after_embed = channel.last["embed"].to_dict()
+    assert "{{" not in json.dumps(after_embed), after_embed  # Every placeholder of the shipped lang is substituted
+    after_embed.pop("timestamp", None), before_embed.pop("timestamp", None)
+    assert after_embed == before_embed, (before_embed, after_embed)
+    assert channel.sent == 2 * JOINS
+
+
+if __name__ == "__main__":
+    main()
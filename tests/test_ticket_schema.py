@@ -0,0 +1,77 @@
+"""
+TicketSystem: apply SCHEMA_MIGRATIONS to an in-memory database and check that every hot query is served by an index.
+Run from the repository root with `python -m pytest tests`.
+"""
+import importlib.util
+import pathlib
+import sqlite3
+import sys
+import types
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+# (query, parameters, index that must serve it)
+HOT_QUERIES = [
+    ("SELECT channel_id, owner_id, claimed_by, category FROM ticketsTicketSystem WHERE closed = false", (), "idx_tickets_open"),  # on_ready
+    ("SELECT * FROM ticketMessages WHERE channel_id = ? ORDER BY timestamp ASC", (1,), "idx_ticket_messages_channel"),  # web transcript
+    ("SELECT MAX(message_id) FROM ticketMessages WHERE channel_id = ?", (1,), "idx_ticket_messages_channel_message"),  # on_ready backfill start
+    ("SELECT message_id FROM ticketMessages WHERE channel_id = ? AND message_id BETWEEN ? AND ?", (1, 0, 1), "idx_ticket_messages_channel_message"),  # backfill dedupe
+    ("DELETE FROM ticketMessages WHERE message_id = ?", (1,), "idx_ticket_messages_message"),  # message edit and delete
+    ("SELECT day, count FROM ticketClaimsDaily WHERE user_id = ? ORDER BY day", (1,), "sqlite_autoindex_ticketClaimsDaily_1"),  # /claims show
+    ("SELECT user_id FROM ticketClaimsTotal ORDER BY count DESC LIMIT 10", (), "idx_ticket_claims_total_count"),  # /claims top10
+    ("UPDATE ticketsTicketSystem SET claimed_by = ?, claim_time = datetime('now') WHERE channel_id = ?", (1, 1), "INTEGER PRIMARY KEY"),  # claim
+]
+
+
+@pytest.fixture(scope="module")
+def ticket_system():
+    sys.modules.setdefault("utils", types.ModuleType("utils"))  # The EbBot core module, the schema code doesn't use it
+    sys.path.insert(0, str(ROOT / "TicketSystem"))  # For Commands.TicketSystem.graphs, as the bot imports it
+    try:
+        path = ROOT / "TicketSystem" / "Commands" / "TicketSystem" / "ticket_system.py"
+        spec = importlib.util.spec_from_file_location("ticket_system", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(ROOT / "TicketSystem"))
+    return module
+
+
+@pytest.fixture
+def db(ticket_system):
+    connection = sqlite3.connect(":memory:")
+    ticket_system.migrate_schema(connection)
+    yield connection
+    connection.close()
+
+
+def test_migrations_reach_latest_version(ticket_system, db):
+    assert db.execute("SELECT version FROM ticketSystemSchema").fetchone()[0] == len(ticket_system.SCHEMA_MIGRATIONS)
+    ticket_system.migrate_schema(db)  # A second start applies nothing
+    assert db.execute("SELECT COUNT(*) FROM ticketSystemSchema").fetchone()[0] == 1
+
+
+def test_claim_totals_are_backfilled(ticket_system):
+    connection = sqlite3.connect(":memory:")
+    for statements in ticket_system.SCHEMA_MIGRATIONS[:5]:
+        for statement in statements:
+            connection.execute(statement)
+    connection.executemany("INSERT INTO ticketClaimsDaily (user_id, day, count) VALUES (?, ?, ?)", [(1, "2026-01-01", 2), (1, "2026-01-02", 3), (2, "2026-01-01", 4)])
+    for statement in ticket_system.SCHEMA_MIGRATIONS[5]:
+        connection.execute(statement)
+    assert connection.execute("SELECT user_id, count FROM ticketClaimsTotal ORDER BY count DESC").fetchall() == [(1, 5), (2, 4)]
+    connection.close()
+
+
+def test_unused_indexes_are_dropped(db):
+    indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_tickets_owner_closed" not in indexes
+    assert "idx_tickets_claimed_by" not in indexes
+
+
+@pytest.mark.parametrize("query, parameters, index", HOT_QUERIES)
+def test_hot_query_uses_index(db, query, parameters, index):
+    plan = [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + query, parameters)]
+    # A SEARCH on the index, or for a top-N query an index walk that stops after N rows (no sort of the whole table)
+    assert any(index in step and (step.startswith("SEARCH ") or " LIMIT " in query and step.startswith("SCAN ")) for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan